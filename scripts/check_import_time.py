@@ -0,0 +1,62 @@
+"""
+Import Time Budget Check
+Measures cold-start import time of the package in fresh interpreters and
+fails when it exceeds the budget
+"""
+
+import os
+import sys
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Budgets in milliseconds, measured with `python -X importtime`
+BUDGETS = {
+    'tradingpatterns': 50,
+    'tradingpatterns.core': 250,
+    'tradingpatterns.utils': 250,
+}
+
+# Modules the lightweight import path must never pull in
+FORBIDDEN = ('pandas', 'matplotlib', 'mplfinance', 'yfinance', 'pyarrow')
+
+def import_time_ms(module, runs=5):
+    """Best-of-N cumulative import time of module in a fresh interpreter"""
+    best = None
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        )
+        total = 0
+        for line in result.stderr.splitlines():
+            # "import time: self [us] | cumulative | imported package"
+            parts = line.split('|')
+            if len(parts) == 3 and parts[2].strip() == module:
+                total = int(parts[1])
+        best = total if best is None else min(best, total)
+    return best / 1000
+
+def loaded_modules(module):
+    """Top-level packages loaded by importing module"""
+    result = subprocess.run(
+        [sys.executable, '-c', f'import sys, {module}; print(" ".join(sys.modules))'],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return {name.split('.')[0] for name in result.stdout.split()}
+
+def main():
+    failed = False
+    for module, budget in BUDGETS.items():
+        elapsed = import_time_ms(module)
+        leaked = sorted(loaded_modules(module) & set(FORBIDDEN))
+        ok = elapsed <= budget and not leaked
+        failed |= not ok
+        status = "✓" if ok else "❌"
+        print(f"{status} import {module}: {elapsed:.1f} ms (budget {budget} ms)")
+        if leaked:
+            print(f"   pulled in: {', '.join(leaked)}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""
+Local Scan Service
+Loads every CSV in data/ (one symbol per file) and serves pattern scans on localhost
+"""
+
+import os
+import sys
+import asyncio
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tradingpatterns import ScanService
+
+async def main(port=8765):
+    data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+    service = ScanService()
+    for name in sorted(os.listdir(data_dir)):
+        if name.endswith('.csv'):
+            service.load(os.path.splitext(name)[0], os.path.join(data_dir, name))
+    
+    server = await service.serve('127.0.0.1', port)
+    print(f"Serving {len(service.data)} symbols on http://127.0.0.1:{port}")
+    print("POST /scan with {\"symbols\": [...], \"detectors\": [...], \"params\": {\"window\": 5}}")
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    try:
+        asyncio.run(main(port))
+    except KeyboardInterrupt:
+        print("\nStopped")
@@ -6,12 +6,7 @@ Generates 9 separate chart images
 
 import os
 import sys
-import pandas as pd
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
-import mplfinance as mpf
-import yfinance as yf
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -28,7 +23,19 @@ from tradingpatterns import (
     filter_best_patterns
 )
 
+# Longer histories are downsampled to about this many candles per chart,
+# keeping every filtered pattern bar as its own candle
+MAX_CANDLES = 1500
+
 def main():
+    # Heavy plotting/download dependencies are only loaded when a chart is made
+    import pandas as pd
+    import matplotlib
+    matplotlib.use('Agg')  # Use non-interactive backend
+    import mplfinance as mpf
+    import yfinance as yf
+    from tradingpatterns.decimate import decimate_ohlc
+    
     # Setup output directory
     output_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'outputs')
     os.makedirs(output_dir, exist_ok=True)
@@ -41,7 +48,10 @@ def main():
         df.columns = df.columns.get_level_values(0)
     ohlc = df[["Open", "High", "Low", "Close"]].copy()
     
-    print(f"Data loaded: {len(ohlc)} candles\n")
+    print(f"Data loaded: {len(ohlc)} candles")
+    if len(ohlc) > MAX_CANDLES:
+        print(f"Charts are decimated to ~{MAX_CANDLES} candles (pattern bars kept)")
+    print()
     
     # 1. HEAD & SHOULDER PATTERNS
     print("=" * 60)
@@ -57,13 +67,12 @@ def main():
     print(f"Found {len(hs_pos)} Head & Shoulder patterns")
     print(f"Found {len(inv_hs_pos)} Inverse Head & Shoulder patterns")
     
-    hs_markers = pd.Series(np.nan, index=ohlc.index)
-    hs_markers.iloc[hs_pos] = ohlc["High"].iloc[hs_pos]
-    inv_hs_markers = pd.Series(np.nan, index=ohlc.index)
-    inv_hs_markers.iloc[inv_hs_pos] = ohlc["Low"].iloc[inv_hs_pos]
+    view = decimate_ohlc(ohlc, MAX_CANDLES, keep=[hs_pos, inv_hs_pos])
+    hs_markers = view.markers(hs_pos, ohlc["High"])
+    inv_hs_markers = view.markers(inv_hs_pos, ohlc["Low"])
     
     mpf.plot(
-        ohlc,
+        view.ohlc,
         type="candle",
         style="yahoo",
         addplot=[
@@ -90,13 +99,12 @@ def main():
     print(f"Found {len(double_top_pos)} Double Top patterns")
     print(f"Found {len(double_bottom_pos)} Double Bottom patterns")
     
-    dt_markers = pd.Series(np.nan, index=ohlc.index)
-    dt_markers.iloc[double_top_pos] = ohlc["High"].iloc[double_top_pos]
-    db_markers = pd.Series(np.nan, index=ohlc.index)
-    db_markers.iloc[double_bottom_pos] = ohlc["Low"].iloc[double_bottom_pos]
+    view = decimate_ohlc(ohlc, MAX_CANDLES, keep=[double_top_pos, double_bottom_pos])
+    dt_markers = view.markers(double_top_pos, ohlc["High"])
+    db_markers = view.markers(double_bottom_pos, ohlc["Low"])
     
     mpf.plot(
-        ohlc,
+        view.ohlc,
         type="candle",
         style="yahoo",
         addplot=[
@@ -123,19 +131,18 @@ def main():
     print(f"Found {len(multi_top_pos)} Multiple Top patterns")
     print(f"Found {len(multi_bottom_pos)} Multiple Bottom patterns")
     
+    view = decimate_ohlc(ohlc, MAX_CANDLES, keep=[multi_top_pos, multi_bottom_pos])
     if len(multi_top_pos) > 0 or len(multi_bottom_pos) > 0:
         addplots = []
         if len(multi_top_pos) > 0:
-            mt_markers = pd.Series(np.nan, index=ohlc.index)
-            mt_markers.iloc[multi_top_pos] = ohlc["High"].iloc[multi_top_pos]
+            mt_markers = view.markers(multi_top_pos, ohlc["High"])
             addplots.append(mpf.make_addplot(mt_markers, type="scatter", marker="D", color="red", markersize=60))
         if len(multi_bottom_pos) > 0:
-            mb_markers = pd.Series(np.nan, index=ohlc.index)
-            mb_markers.iloc[multi_bottom_pos] = ohlc["Low"].iloc[multi_bottom_pos]
+            mb_markers = view.markers(multi_bottom_pos, ohlc["Low"])
             addplots.append(mpf.make_addplot(mb_markers, type="scatter", marker="D", color="green", markersize=60))
         
         mpf.plot(
-            ohlc,
+            view.ohlc,
             type="candle",
             style="yahoo",
             addplot=addplots,
@@ -161,19 +168,18 @@ def main():
     print(f"Found {len(asc_triangle_pos)} Ascending Triangle patterns")
     print(f"Found {len(desc_triangle_pos)} Descending Triangle patterns")
     
+    view = decimate_ohlc(ohlc, MAX_CANDLES, keep=[asc_triangle_pos, desc_triangle_pos])
     if len(asc_triangle_pos) > 0 or len(desc_triangle_pos) > 0:
         addplots = []
         if len(asc_triangle_pos) > 0:
-            at_markers = pd.Series(np.nan, index=ohlc.index)
-            at_markers.iloc[asc_triangle_pos] = ohlc["Low"].iloc[asc_triangle_pos]
+            at_markers = view.markers(asc_triangle_pos, ohlc["Low"])
             addplots.append(mpf.make_addplot(at_markers, type="scatter", marker="^", color="blue", markersize=80))
         if len(desc_triangle_pos) > 0:
-            dt_tri_markers = pd.Series(np.nan, index=ohlc.index)
-            dt_tri_markers.iloc[desc_triangle_pos] = ohlc["High"].iloc[desc_triangle_pos]
+            dt_tri_markers = view.markers(desc_triangle_pos, ohlc["High"])
             addplots.append(mpf.make_addplot(dt_tri_markers, type="scatter", marker="v", color="orange", markersize=80))
         
         mpf.plot(
-            ohlc,
+            view.ohlc,
             type="candle",
             style="yahoo",
             addplot=addplots,
@@ -199,19 +205,18 @@ def main():
     print(f"Found {len(wedge_up_pos)} Wedge Up patterns")
     print(f"Found {len(wedge_down_pos)} Wedge Down patterns")
     
+    view = decimate_ohlc(ohlc, MAX_CANDLES, keep=[wedge_up_pos, wedge_down_pos])
     if len(wedge_up_pos) > 0 or len(wedge_down_pos) > 0:
         addplots = []
         if len(wedge_up_pos) > 0:
-            wu_markers = pd.Series(np.nan, index=ohlc.index)
-            wu_markers.iloc[wedge_up_pos] = ohlc["Low"].iloc[wedge_up_pos]
+            wu_markers = view.markers(wedge_up_pos, ohlc["Low"])
             addplots.append(mpf.make_addplot(wu_markers, type="scatter", marker="P", color="green", markersize=80))
         if len(wedge_down_pos) > 0:
-            wd_markers = pd.Series(np.nan, index=ohlc.index)
-            wd_markers.iloc[wedge_down_pos] = ohlc["High"].iloc[wedge_down_pos]
+            wd_markers = view.markers(wedge_down_pos, ohlc["High"])
             addplots.append(mpf.make_addplot(wd_markers, type="scatter", marker="P", color="red", markersize=80))
         
         mpf.plot(
-            ohlc,
+            view.ohlc,
             type="candle",
             style="yahoo",
             addplot=addplots,
@@ -237,19 +242,18 @@ def main():
     print(f"Found {len(channel_up_pos)} Channel Up patterns")
     print(f"Found {len(channel_down_pos)} Channel Down patterns")
     
+    view = decimate_ohlc(ohlc, MAX_CANDLES, keep=[channel_up_pos, channel_down_pos])
     if len(channel_up_pos) > 0 or len(channel_down_pos) > 0:
         addplots = []
         if len(channel_up_pos) > 0:
-            cu_markers = pd.Series(np.nan, index=ohlc.index)
-            cu_markers.iloc[channel_up_pos] = ohlc["Low"].iloc[channel_up_pos]
+            cu_markers = view.markers(channel_up_pos, ohlc["Low"])
             addplots.append(mpf.make_addplot(cu_markers, type="scatter", marker="s", color="cyan", markersize=60))
         if len(channel_down_pos) > 0:
-            cd_markers = pd.Series(np.nan, index=ohlc.index)
-            cd_markers.iloc[channel_down_pos] = ohlc["High"].iloc[channel_down_pos]
+            cd_markers = view.markers(channel_down_pos, ohlc["High"])
             addplots.append(mpf.make_addplot(cd_markers, type="scatter", marker="s", color="magenta", markersize=60))
         
         mpf.plot(
-            ohlc,
+            view.ohlc,
             type="candle",
             style="yahoo",
             addplot=addplots,
@@ -267,11 +271,12 @@ def main():
     print("=" * 60)
     work_sr = calculate_support_resistance(ohlc.reset_index(drop=True).copy(), window=20)
     
-    support_line = pd.Series(work_sr["support"].values, index=ohlc.index)
-    resistance_line = pd.Series(work_sr["resistance"].values, index=ohlc.index)
+    view = decimate_ohlc(ohlc, MAX_CANDLES)
+    support_line = view.series(work_sr["support"])
+    resistance_line = view.series(work_sr["resistance"])
     
     mpf.plot(
-        ohlc,
+        view.ohlc,
         type="candle",
         style="yahoo",
         addplot=[
@@ -307,17 +312,14 @@ def main():
     print(f"Found {len(lh_pos)} Lower Highs (LH)")
     print(f"Found {len(hl_pos)} Higher Lows (HL)")
     
-    hh_markers = pd.Series(np.nan, index=ohlc.index)
-    hh_markers.iloc[hh_pos] = ohlc["High"].iloc[hh_pos]
-    ll_markers = pd.Series(np.nan, index=ohlc.index)
-    ll_markers.iloc[ll_pos] = ohlc["Low"].iloc[ll_pos]
-    lh_markers = pd.Series(np.nan, index=ohlc.index)
-    lh_markers.iloc[lh_pos] = ohlc["High"].iloc[lh_pos]
-    hl_markers = pd.Series(np.nan, index=ohlc.index)
-    hl_markers.iloc[hl_pos] = ohlc["Low"].iloc[hl_pos]
+    view = decimate_ohlc(ohlc, MAX_CANDLES, keep=[hh_pos, ll_pos, lh_pos, hl_pos])
+    hh_markers = view.markers(hh_pos, ohlc["High"])
+    ll_markers = view.markers(ll_pos, ohlc["Low"])
+    lh_markers = view.markers(lh_pos, ohlc["High"])
+    hl_markers = view.markers(hl_pos, ohlc["Low"])
     
     mpf.plot(
-        ohlc,
+        view.ohlc,
         type="candle",
         style="yahoo",
         addplot=[
@@ -337,6 +339,15 @@ def main():
     print("9. ALL PATTERNS COMBINED VIEW")
     print("=" * 60)
     
+    # Rebuild markers and lines on a view that keeps every combined marker intact
+    view = decimate_ohlc(ohlc, MAX_CANDLES, keep=[hs_pos, inv_hs_pos, double_top_pos, double_bottom_pos])
+    hs_markers = view.markers(hs_pos, ohlc["High"])
+    inv_hs_markers = view.markers(inv_hs_pos, ohlc["Low"])
+    dt_markers = view.markers(double_top_pos, ohlc["High"])
+    db_markers = view.markers(double_bottom_pos, ohlc["Low"])
+    support_line = view.series(work_sr["support"])
+    resistance_line = view.series(work_sr["resistance"])
+    
     combined_plots = [
         mpf.make_addplot(hs_markers, type="scatter", marker="v", color="red", markersize=50),
         mpf.make_addplot(inv_hs_markers, type="scatter", marker="^", color="green", markersize=50),
@@ -347,7 +358,7 @@ def main():
     ]
     
     mpf.plot(
-        ohlc,
+        view.ohlc,
         type="candle",
         style="yahoo",
         addplot=combined_plots,
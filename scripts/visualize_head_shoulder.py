@@ -5,19 +5,26 @@ Detects and visualizes Head & Shoulder and Inverse Head & Shoulder patterns
 
 import os
 import sys
-import pandas as pd
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
-import mplfinance as mpf
-import yfinance as yf
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from tradingpatterns import detect_head_shoulder, filter_best_patterns
 
+# Longer histories are downsampled to about this many candles,
+# keeping every filtered pattern bar as its own candle
+MAX_CANDLES = 1500
+
 def main():
+    # Heavy plotting/download dependencies are only loaded when a chart is made
+    import pandas as pd
+    import matplotlib
+    matplotlib.use('Agg')  # Use non-interactive backend
+    import mplfinance as mpf
+    import yfinance as yf
+    from tradingpatterns.decimate import decimate_ohlc
+    
     # Output directory
     output_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'outputs')
     os.makedirs(output_dir, exist_ok=True)
@@ -42,11 +49,10 @@ def main():
     hs_pos = filter_best_patterns(hs_pos, ohlc, cluster_distance=10, min_distance=15, max_patterns=10)
     inv_pos = filter_best_patterns(inv_pos, ohlc, cluster_distance=10, min_distance=15, max_patterns=10)
     
-    # Create marker series
-    hs_markers = pd.Series(np.nan, index=ohlc.index)
-    hs_markers.iloc[hs_pos] = ohlc["High"].iloc[hs_pos]
-    inv_markers = pd.Series(np.nan, index=ohlc.index)
-    inv_markers.iloc[inv_pos] = ohlc["Low"].iloc[inv_pos]
+    # Create marker series on the (possibly decimated) chart frame
+    view = decimate_ohlc(ohlc, MAX_CANDLES, keep=[hs_pos, inv_pos])
+    hs_markers = view.markers(hs_pos, ohlc["High"])
+    inv_markers = view.markers(inv_pos, ohlc["Low"])
     
     # Plot
     print(f"✓ Found {len(hs_pos)} Head & Shoulder patterns")
@@ -54,7 +60,7 @@ def main():
     
     output_path = os.path.join(output_dir, 'head_shoulder_patterns.png')
     mpf.plot(
-        ohlc,
+        view.ohlc,
         type="candle",
         style="yahoo",
         addplot=[
@@ -1,39 +1,72 @@
-"""Trading Pattern Detection Package"""
-
-from .tradingpatterns import (
-    detect_head_shoulder,
-    detect_multiple_tops_bottoms,
-    calculate_support_resistance,
-    detect_triangle_pattern,
-    detect_wedge,
-    detect_channel,
-    detect_double_top_bottom,
-    detect_trendline,
-    find_pivots
-)
-
-from .utils import (
-    filter_patterns_by_distance,
-    cluster_and_select_best,
-    filter_by_strength,
-    filter_best_patterns
-)
-
-__all__ = [
+"""Trading Pattern Detection Package
+
+Names are imported from their submodules on first access, so
+``import tradingpatterns`` stays cheap and pandas, pyarrow and friends are
+only loaded by the features that need them. ``tradingpatterns.core`` and
+``tradingpatterns.utils`` depend on NumPy alone.
+"""
+
+import importlib
+
+_EXPORTS = {
     # Pattern detection functions
-    'detect_head_shoulder',
-    'detect_multiple_tops_bottoms',
-    'calculate_support_resistance',
-    'detect_triangle_pattern',
-    'detect_wedge',
-    'detect_channel',
-    'detect_double_top_bottom',
-    'detect_trendline',
-    'find_pivots',
+    'detect_head_shoulder': 'tradingpatterns',
+    'detect_multiple_tops_bottoms': 'tradingpatterns',
+    'calculate_support_resistance': 'tradingpatterns',
+    'detect_triangle_pattern': 'tradingpatterns',
+    'detect_wedge': 'tradingpatterns',
+    'detect_channel': 'tradingpatterns',
+    'detect_double_top_bottom': 'tradingpatterns',
+    'detect_trendline': 'tradingpatterns',
+    'find_pivots': 'tradingpatterns',
+    # NumPy core
+    'PATTERN_LABELS': 'core',
+    'pattern_codes': 'core',
+    'decode': 'core',
     # Utility functions
-    'filter_patterns_by_distance',
-    'cluster_and_select_best',
-    'filter_by_strength',
-    'filter_best_patterns'
-]
+    'filter_patterns_by_distance': 'utils',
+    'cluster_and_select_best': 'utils',
+    'filter_by_strength': 'utils',
+    'filter_best_patterns': 'utils',
+    'top_k_indices': 'utils',
+    'TopKRanker': 'ranking',
+    # Parameter search
+    'optimize_parameters': 'optimize',
+    'walk_forward_folds': 'optimize',
+    # Incremental recomputation
+    'IncrementalDetector': 'incremental',
+    # Streaming
+    'TickAggregator': 'aggregator',
+    'replay_ticks': 'aggregator',
+    'SymbolStateStore': 'state',
+    # Similarity search
+    'SimilarityIndex': 'similarity',
+    'sliding_distance': 'similarity',
+    # Services
+    'ScanService': 'service',
+    'Pipeline': 'pipeline',
+    'ReplaySource': 'pipeline',
+    'DetectionStage': 'pipeline',
+    # Export
+    'PatternWriter': 'export',
+    'write_patterns': 'export',
+    'read_patterns': 'export',
+    # Charting
+    'Decimation': 'decimate',
+    'decimate_ohlc': 'decimate',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
+
 
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,315 @@
+"""Streaming tick-to-bar aggregation feeding the pattern detectors"""
+
+import inspect
+
+import numpy as np
+import pandas as pd
+
+from . import tradingpatterns as _detectors
+from .core import PATTERN_LABELS, PATTERN_LOOKAHEAD, pattern_codes, decode
+
+
+BAR_TYPES = ('time', 'tick', 'volume')
+BAR_FIELDS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+# DataFrame detectors with a NumPy equivalent in core, by function name
+DETECTOR_PATTERNS = {
+    'detect_head_shoulder': 'head_shoulder',
+    'detect_multiple_tops_bottoms': 'multiple_top_bottom',
+    'detect_triangle_pattern': 'triangle',
+    'detect_wedge': 'wedge',
+    'detect_channel': 'channel',
+    'detect_double_top_bottom': 'double',
+}
+
+
+def _pattern_spec(detector):
+    """
+    (pattern, window, threshold) of a detector core can evaluate, else None
+
+    Accepts a key of core.PATTERN_LABELS, a built-in DataFrame detector, or a
+    functools.partial of one with keyword parameters.
+    """
+    if isinstance(detector, str):
+        if detector not in PATTERN_LABELS:
+            raise ValueError(f"Unknown pattern {detector!r}, expected one of {tuple(PATTERN_LABELS)}")
+        return detector, 3, 0.05
+    func = getattr(detector, 'func', detector)
+    name = getattr(func, '__name__', None)
+    if name not in DETECTOR_PATTERNS or getattr(_detectors, name) is not func or getattr(detector, 'args', ()):
+        return None
+    params = {k: p.default for k, p in inspect.signature(func).parameters.items() if p.default is not p.empty}
+    params.update(getattr(detector, 'keywords', None) or {})
+    return DETECTOR_PATTERNS[name], params['window'], params.get('threshold', 0.05)
+
+
+def _to_nanoseconds(timestamps):
+    """
+    Convert timestamps to int64 nanoseconds since the epoch
+
+    Args:
+        timestamps: datetime64 array or numeric epoch seconds
+
+    Returns:
+        int64 array of nanoseconds
+    """
+    timestamps = np.asarray(timestamps)
+    if np.issubdtype(timestamps.dtype, np.datetime64):
+        return timestamps.astype('datetime64[ns]').view(np.int64)
+    return np.round(timestamps.astype(np.float64) * 1e9).astype(np.int64)
+
+
+class TickAggregator:
+    """
+    Turn a stream of (timestamp, price, size) ticks into OHLC bars
+
+    Ticks are consumed in vectorized batches: the bar each tick belongs to
+    is computed for the whole batch at once and reduced with ``reduceat``,
+    so throughput is bound by NumPy rather than the Python loop. Closed bars
+    are written into preallocated ring buffers holding the last ``window``
+    bars. When ``detectors`` or ``on_bar`` are given, the bars closed by each
+    batch are labelled together: the built-in patterns are evaluated with
+    core.pattern_codes on only the trailing bars their new labels depend
+    on, and any other detector runs once on the window.
+
+    Bars close on a fixed grid:
+    - 'time': every ``bar_size`` seconds (bar timestamp is the bucket start)
+    - 'tick': every ``bar_size`` ticks
+    - 'volume': every time cumulative volume crosses a multiple of ``bar_size``
+
+    Args:
+        bar_type: One of 'time', 'tick' or 'volume'
+        bar_size: Seconds, ticks or volume units per bar
+        window: Number of closed bars kept in the ring buffer
+        detectors: Iterable of pattern names (keys of core.PATTERN_LABELS),
+            built-in detector functions such as detect_head_shoulder (or a
+            functools.partial setting their window/threshold), or custom
+            DataFrame-in/DataFrame-out detectors
+        on_bar: Callback receiving, after each batch that closed bars, a
+            DataFrame of those bars with the detectors' columns (one
+            <pattern>_pattern label column per built-in pattern). When a
+            pattern looks one bar ahead, the bar before them comes first,
+            since its label only became final with the new bars.
+    """
+
+    def __init__(self, bar_type='time', bar_size=60, window=500, detectors=None, on_bar=None):
+        if bar_type not in BAR_TYPES:
+            raise ValueError(f"bar_type must be one of {BAR_TYPES}, got {bar_type!r}")
+        if bar_size <= 0:
+            raise ValueError("bar_size must be positive")
+        if window <= 0:
+            raise ValueError("window must be positive")
+
+        self.bar_type = bar_type
+        self.bar_size = bar_size
+        self.window = window
+        self.detectors = list(detectors) if detectors is not None else []
+        self.on_bar = on_bar
+        self._patterns = []
+        self._custom = []
+        for detector in self.detectors:
+            spec = _pattern_spec(detector)
+            if spec is None:
+                self._custom.append(detector)
+            else:
+                self._patterns.append(spec)
+        self._lookahead = max((PATTERN_LOOKAHEAD[p] for p, _, _ in self._patterns), default=0)
+
+        # Ring buffers for closed bars
+        self._time = np.zeros(window, dtype=np.int64)
+        self._ohlcv = np.zeros((window, len(BAR_FIELDS)), dtype=np.float64)
+        self._head = 0
+        self._count = 0
+        self.bars_closed = 0
+
+        # Running counters used to place ticks on the bar grid
+        self._ticks_seen = 0
+        self._volume_seen = 0.0
+
+        # The bar currently being built
+        self._open_id = None
+        self._open_time = 0
+        self._open_bar = np.zeros(len(BAR_FIELDS), dtype=np.float64)
+
+    def _bar_ids(self, ts_ns, sizes):
+        """Assign every tick of a batch to a bar on the grid"""
+        n = len(ts_ns)
+        if self.bar_type == 'time':
+            step = int(round(self.bar_size * 1e9))
+            ids = ts_ns // step
+            starts = ids * step
+        elif self.bar_type == 'tick':
+            ids = (self._ticks_seen + np.arange(n, dtype=np.int64)) // int(self.bar_size)
+            starts = ts_ns
+        else:
+            # A tick belongs to the bar in which its volume starts accumulating
+            cum_before = self._volume_seen + np.cumsum(sizes) - sizes
+            ids = np.floor(cum_before / self.bar_size).astype(np.int64)
+            starts = ts_ns
+        return ids, starts
+
+    def update(self, timestamps, prices, sizes):
+        """
+        Consume a batch of ticks
+
+        Args:
+            timestamps: datetime64 array or numeric epoch seconds, non-decreasing
+            prices: Trade prices
+            sizes: Trade sizes
+
+        Returns:
+            Number of bars closed by this batch
+        """
+        ts_ns = _to_nanoseconds(timestamps)
+        prices = np.asarray(prices, dtype=np.float64)
+        sizes = np.asarray(sizes, dtype=np.float64)
+        if not (len(ts_ns) == len(prices) == len(sizes)):
+            raise ValueError("timestamps, prices and sizes must have the same length")
+        if len(ts_ns) == 0:
+            return 0
+
+        ids, starts = self._bar_ids(ts_ns, sizes)
+        self._ticks_seen += len(ts_ns)
+        self._volume_seen += float(sizes.sum())
+
+        # Segment boundaries: first tick of every distinct bar id in the batch
+        seg = np.flatnonzero(np.diff(ids)) + 1
+        seg = np.concatenate(([0], seg))
+        ends = np.concatenate((seg[1:], [len(ids)])) - 1
+
+        bars = np.empty((len(seg), len(BAR_FIELDS)), dtype=np.float64)
+        bars[:, 0] = prices[seg]
+        bars[:, 1] = np.maximum.reduceat(prices, seg)
+        bars[:, 2] = np.minimum.reduceat(prices, seg)
+        bars[:, 3] = prices[ends]
+        bars[:, 4] = np.add.reduceat(sizes, seg)
+        bar_ids = ids[seg]
+        bar_times = starts[seg]
+
+        # Fold the first segment into the bar left open by the previous batch
+        closed_times = []
+        closed_bars = []
+        if self._open_id is not None:
+            if bar_ids[0] == self._open_id:
+                first = bars[0]
+                bars[0, 0] = self._open_bar[0]
+                bars[0, 1] = max(self._open_bar[1], first[1])
+                bars[0, 2] = min(self._open_bar[2], first[2])
+                bars[0, 4] += self._open_bar[4]
+                bar_times[0] = self._open_time
+            else:
+                closed_times.append(np.array([self._open_time]))
+                closed_bars.append(self._open_bar[None, :].copy())
+
+        # Every segment except the last one is complete
+        closed_times.append(bar_times[:-1])
+        closed_bars.append(bars[:-1])
+        self._open_id = bar_ids[-1]
+        self._open_time = bar_times[-1]
+        self._open_bar = bars[-1].copy()
+
+        return self._close(np.concatenate(closed_times), np.concatenate(closed_bars))
+
+    def flush(self):
+        """
+        Close the bar currently being built
+
+        Returns:
+            Number of bars closed (0 or 1)
+        """
+        if self._open_id is None:
+            return 0
+        times = np.array([self._open_time])
+        bars = self._open_bar[None, :].copy()
+        self._open_id = None
+        return self._close(times, bars)
+
+    def _close(self, times, bars):
+        """Write closed bars into the ring buffer and dispatch them"""
+        n = len(times)
+        if n == 0:
+            return 0
+        self._push(times, bars)
+        self.bars_closed += n
+        if self.detectors or self.on_bar is not None:
+            self._dispatch(n)
+        return n
+
+    def _push(self, times, bars):
+        """Vectorized append to the ring buffer"""
+        n = len(times)
+        if n >= self.window:
+            times = times[-self.window:]
+            bars = bars[-self.window:]
+            n = self.window
+        idx = (self._head + np.arange(n)) % self.window
+        self._time[idx] = times
+        self._ohlcv[idx] = bars
+        self._head = (self._head + n) % self.window
+        self._count = min(self._count + n, self.window)
+
+    def _dispatch(self, n):
+        """Label the n bars just closed (and the bar waiting for its look-ahead) and hand them to on_bar"""
+        rows = min(n + self._lookahead, self._count)
+        idx = self._positions(rows)
+        columns = dict(zip(BAR_FIELDS, self._ohlcv[idx].T))
+        for pattern, window, threshold in self._patterns:
+            # The rolling windows of the labelled rows reach window + 1 bars further back
+            values = self._ohlcv[self._positions(rows + window + 1)]
+            codes = pattern_codes(pattern, values[:, 1], values[:, 2], values[:, 3], window, threshold)
+            columns[f'{pattern}_pattern'] = decode(pattern, codes[-rows:])
+        frame = pd.DataFrame(columns, index=pd.DatetimeIndex(self._time[idx].view('datetime64[ns]'), name='Date'))
+        if self._custom:
+            window_frame = self.frame()
+            for detector in self._custom:
+                window_frame = detector(window_frame)
+            for column in window_frame.columns.difference(frame.columns, sort=False):
+                frame[column] = window_frame[column].to_numpy()[-rows:]
+        if self.on_bar is not None:
+            self.on_bar(frame)
+
+    def _positions(self, last):
+        """Ring buffer slots of the last `last` closed bars (at most all held), oldest first"""
+        last = min(last, self._count)
+        return (self._head - last + np.arange(last)) % self.window
+
+    def frame(self, last=None):
+        """
+        Closed bars in the ring buffer as an OHLCV DataFrame
+
+        Args:
+            last: Only the most recent `last` bars (default: all held)
+
+        Returns:
+            DataFrame indexed by bar timestamp, oldest bar first
+        """
+        idx = self._positions(self._count if last is None else last)
+        return pd.DataFrame(
+            self._ohlcv[idx],
+            columns=list(BAR_FIELDS),
+            index=pd.DatetimeIndex(self._time[idx].view('datetime64[ns]'), name='Date'),
+        )
+
+
+def replay_ticks(path, aggregator, chunksize=1_000_000):
+    """
+    Replay a local tick file through an aggregator
+
+    The file is a CSV with 'timestamp', 'price' and 'size' columns; timestamps
+    are either epoch seconds or anything pandas can parse as datetimes.
+
+    Args:
+        path: Path to the replay file
+        aggregator: TickAggregator consuming the ticks
+        chunksize: Number of ticks read and fed per batch
+
+    Returns:
+        The aggregator, after its last open bar has been flushed
+    """
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        timestamps = chunk['timestamp']
+        if not pd.api.types.is_numeric_dtype(timestamps):
+            timestamps = pd.to_datetime(timestamps, utc=True).dt.tz_localize(None)
+        aggregator.update(timestamps.to_numpy(), chunk['price'].to_numpy(), chunk['size'].to_numpy())
+    aggregator.flush()
+    return aggregator
@@ -0,0 +1,200 @@
+"""NumPy implementations of the pattern masks
+
+Every function operates along the last axis, so a 1-D series and a 2-D
+(symbols x bars) matrix are evaluated the same way. Results match the
+DataFrame detectors in tradingpatterns.py bar for bar: NaN windows and
+shifted-out bars never match, exactly like the pandas comparisons.
+
+The *_masks functions hold each pattern's conditions as expressions (see
+expr.py) over whichever terms the caller supplies: the *_codes functions
+pass rolling nodes computed block by block, while the DataFrame detectors
+pass their already computed columns.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from . import expr
+from .expr import col, evaluate_codes
+
+
+PATTERN_LABELS = {
+    'head_shoulder': ('', 'Head and Shoulder', 'Inverse Head and Shoulder'),
+    'multiple_top_bottom': ('', 'Multiple Top', 'Multiple Bottom'),
+    'triangle': ('', 'Ascending Triangle', 'Descending Triangle'),
+    'wedge': ('', 'Wedge Up', 'Wedge Down'),
+    'channel': ('', 'Channel Up', 'Channel Down'),
+    'double': ('', 'Double Top', 'Double Bottom'),
+}
+
+# Bars after a bar that its label depends on (the masks using shift(-1))
+PATTERN_LOOKAHEAD = {
+    'head_shoulder': 1,
+    'multiple_top_bottom': 0,
+    'triangle': 0,
+    'wedge': 0,
+    'channel': 0,
+    'double': 1,
+}
+
+
+def _rolling(x, window, reduce):
+    """Apply a reduction over trailing windows, NaN-padded at the front"""
+    x = np.asarray(x, dtype=np.float64)
+    out = np.full(x.shape, np.nan)
+    if x.shape[-1] >= window:
+        out[..., window - 1:] = reduce(sliding_window_view(x, window, axis=-1), axis=-1)
+    return out
+
+
+def rolling_max(x, window):
+    """Trailing rolling maximum, same as Series.rolling(window).max()"""
+    return _rolling(x, window, np.max)
+
+
+def rolling_min(x, window):
+    """Trailing rolling minimum, same as Series.rolling(window).min()"""
+    return _rolling(x, window, np.min)
+
+
+def shift(x, periods):
+    """Shift along the last axis filling with NaN, same as Series.shift()"""
+    x = np.asarray(x, dtype=np.float64)
+    out = np.full(x.shape, np.nan)
+    if periods > 0:
+        out[..., periods:] = x[..., :-periods]
+    elif periods < 0:
+        out[..., :periods] = x[..., -periods:]
+    else:
+        out[...] = x
+    return out
+
+
+def trend(x, window):
+    """Sign of the change over each trailing window (1, -1, 0 or NaN)"""
+    x = np.asarray(x, dtype=np.float64)
+    out = np.full(x.shape, np.nan)
+    if x.shape[-1] >= window:
+        out[..., window - 1:] = np.sign(x[..., window - 1:] - x[..., :x.shape[-1] - window + 1])
+    return out
+
+
+def head_shoulder_masks(high, low, high_roll_max, low_roll_min):
+    """Head and Shoulder / Inverse Head and Shoulder conditions as expressions"""
+    mask_head_shoulder = (high_roll_max > high.shift(1)) & (high_roll_max > high.shift(-1)) & (high < high.shift(1)) & (high < high.shift(-1))
+    mask_inv_head_shoulder = (low_roll_min < low.shift(1)) & (low_roll_min < low.shift(-1)) & (low > low.shift(1)) & (low > low.shift(-1))
+    return mask_head_shoulder, mask_inv_head_shoulder
+
+
+def multiple_top_bottom_masks(high, low, close, high_roll_max, low_roll_min, close_roll_max, close_roll_min):
+    """Multiple Top / Multiple Bottom conditions as expressions"""
+    mask_top = (high_roll_max >= high.shift(1)) & (close_roll_max < close.shift(1))
+    mask_bottom = (low_roll_min <= low.shift(1)) & (close_roll_min > close.shift(1))
+    return mask_top, mask_bottom
+
+
+def triangle_masks(high, low, close, high_roll_max, low_roll_min):
+    """Ascending / Descending Triangle conditions as expressions"""
+    mask_asc = (high_roll_max >= high.shift(1)) & (low_roll_min <= low.shift(1)) & (close > close.shift(1))
+    mask_desc = (high_roll_max <= high.shift(1)) & (low_roll_min >= low.shift(1)) & (close < close.shift(1))
+    return mask_asc, mask_desc
+
+
+def wedge_masks(high, low, high_roll_max, low_roll_min, trend_high, trend_low):
+    """Wedge Up / Wedge Down conditions as expressions"""
+    mask_wedge_up = (high_roll_max >= high.shift(1)) & (low_roll_min <= low.shift(1)) & (trend_high == 1) & (trend_low == 1)
+    mask_wedge_down = (high_roll_max <= high.shift(1)) & (low_roll_min >= low.shift(1)) & (trend_high == -1) & (trend_low == -1)
+    return mask_wedge_up, mask_wedge_down
+
+
+def channel_masks(high, low, high_roll_max, low_roll_min, trend_high, trend_low, channel_range=0.1):
+    """Channel Up / Channel Down conditions as expressions"""
+    narrow = high_roll_max - low_roll_min <= channel_range * (high_roll_max + low_roll_min) / 2
+    mask_channel_up = (high_roll_max >= high.shift(1)) & (low_roll_min <= low.shift(1)) & narrow & (trend_high == 1) & (trend_low == 1)
+    mask_channel_down = (high_roll_max <= high.shift(1)) & (low_roll_min >= low.shift(1)) & narrow & (trend_high == -1) & (trend_low == -1)
+    return mask_channel_up, mask_channel_down
+
+
+def double_masks(high, low, high_roll_max, low_roll_min, threshold=0.05):
+    """Double Top / Double Bottom conditions as expressions"""
+    tight_prev = (high.shift(1) - low.shift(1)) <= threshold * (high.shift(1) + low.shift(1)) / 2
+    tight_next = (high.shift(-1) - low.shift(-1)) <= threshold * (high.shift(-1) + low.shift(-1)) / 2
+    mask_double_top = (high_roll_max >= high.shift(1)) & (high_roll_max >= high.shift(-1)) & (high < high.shift(1)) & (high < high.shift(-1)) & tight_prev & tight_next
+    mask_double_bottom = (low_roll_min <= low.shift(1)) & (low_roll_min <= low.shift(-1)) & (low > low.shift(1)) & (low > low.shift(-1)) & tight_prev & tight_next
+    return mask_double_top, mask_double_bottom
+
+
+def head_shoulder_codes(high, low, window=3):
+    """Label codes for detect_head_shoulder (see PATTERN_LABELS['head_shoulder'])"""
+    masks = head_shoulder_masks(col('High'), col('Low'), expr.rolling_max('High', window), expr.rolling_min('Low', window))
+    return evaluate_codes(*masks, {'High': high, 'Low': low})
+
+
+def multiple_top_bottom_codes(high, low, close, window=3):
+    """Label codes for detect_multiple_tops_bottoms"""
+    masks = multiple_top_bottom_masks(
+        col('High'), col('Low'), col('Close'),
+        expr.rolling_max('High', window), expr.rolling_min('Low', window),
+        expr.rolling_max('Close', window), expr.rolling_min('Close', window))
+    return evaluate_codes(*masks, {'High': high, 'Low': low, 'Close': close})
+
+
+def triangle_codes(high, low, close, window=3):
+    """Label codes for detect_triangle_pattern"""
+    masks = triangle_masks(col('High'), col('Low'), col('Close'), expr.rolling_max('High', window), expr.rolling_min('Low', window))
+    return evaluate_codes(*masks, {'High': high, 'Low': low, 'Close': close})
+
+
+def wedge_codes(high, low, window=3):
+    """Label codes for detect_wedge"""
+    masks = wedge_masks(
+        col('High'), col('Low'), expr.rolling_max('High', window), expr.rolling_min('Low', window),
+        expr.trend('High', window), expr.trend('Low', window))
+    return evaluate_codes(*masks, {'High': high, 'Low': low})
+
+
+def channel_codes(high, low, window=3, channel_range=0.1):
+    """Label codes for detect_channel"""
+    masks = channel_masks(
+        col('High'), col('Low'), expr.rolling_max('High', window), expr.rolling_min('Low', window),
+        expr.trend('High', window), expr.trend('Low', window), channel_range)
+    return evaluate_codes(*masks, {'High': high, 'Low': low})
+
+
+def double_codes(high, low, window=3, threshold=0.05):
+    """Label codes for detect_double_top_bottom"""
+    masks = double_masks(col('High'), col('Low'), expr.rolling_max('High', window), expr.rolling_min('Low', window), threshold)
+    return evaluate_codes(*masks, {'High': high, 'Low': low})
+
+
+def pattern_codes(pattern, high, low, close, window=3, threshold=0.05):
+    """
+    Evaluate one pattern by name
+
+    Args:
+        pattern: Key of PATTERN_LABELS
+        high, low, close: Arrays of prices, bars along the last axis
+        window: Rolling window
+        threshold: Range threshold, only used by 'double'
+
+    Returns:
+        int8 array of label codes indexing PATTERN_LABELS[pattern]
+    """
+    if pattern == 'head_shoulder':
+        return head_shoulder_codes(high, low, window)
+    if pattern == 'multiple_top_bottom':
+        return multiple_top_bottom_codes(high, low, close, window)
+    if pattern == 'triangle':
+        return triangle_codes(high, low, close, window)
+    if pattern == 'wedge':
+        return wedge_codes(high, low, window)
+    if pattern == 'channel':
+        return channel_codes(high, low, window)
+    if pattern == 'double':
+        return double_codes(high, low, window, threshold)
+    raise ValueError(f"Unknown pattern {pattern!r}, expected one of {tuple(PATTERN_LABELS)}")
+
+
+def decode(pattern, codes):
+    """Map label codes back to the label strings used by the DataFrame API"""
+    return np.asarray(PATTERN_LABELS[pattern], dtype=object)[codes]
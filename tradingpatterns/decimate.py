@@ -0,0 +1,113 @@
+"""Display decimation of long OHLC histories"""
+
+import numpy as np
+import pandas as pd
+
+
+class Decimation:
+    """
+    OHLC-preserving bucket aggregation of a frame for charting
+
+    Consecutive bars are merged into at most about `max_bars` buckets: Open of
+    the first bar, High max, Low min, Close of the last bar and summed Volume,
+    timestamped with the first bar. Every bar listed in `keep` gets a bucket
+    of its own, so pattern markers land on exactly the candle they refer to
+    and keep its High/Low. Frames that already fit are passed through
+    unchanged.
+
+    Args:
+        ohlc: DataFrame with Open, High, Low, Close (and optionally Volume)
+        max_bars: Target number of displayed candles, excluding kept bars
+        keep: Iterables of row positions that must stay individual candles
+    """
+
+    def __init__(self, ohlc, max_bars=1500, keep=()):
+        n = len(ohlc)
+        kept = [np.asarray(p, dtype=np.int64) for p in keep if len(p)]
+        kept = np.unique(np.concatenate(kept)) if kept else np.empty(0, dtype=np.int64)
+
+        if n <= max_bars:
+            starts = np.arange(n)
+        else:
+            starts = np.linspace(0, n, max_bars + 1, dtype=np.int64)[:-1]
+            starts = np.union1d(starts, np.concatenate((kept, kept + 1)))
+            starts = starts[starts < n]
+        self.starts = starts
+        self.source_length = n
+        # bucket[i] is the displayed candle holding original bar i
+        self.bucket = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, n)))
+        self.ohlc = self._aggregate(ohlc)
+
+    def _aggregate(self, ohlc):
+        """Reduce every bucket to one candle"""
+        if len(self.starts) == self.source_length:
+            return ohlc
+        ends = np.append(self.starts[1:], self.source_length) - 1
+        data = {
+            'Open': ohlc['Open'].to_numpy(dtype=np.float64)[self.starts],
+            'High': np.fmax.reduceat(ohlc['High'].to_numpy(dtype=np.float64), self.starts),
+            'Low': np.fmin.reduceat(ohlc['Low'].to_numpy(dtype=np.float64), self.starts),
+            'Close': ohlc['Close'].to_numpy(dtype=np.float64)[ends],
+        }
+        if 'Volume' in ohlc.columns:
+            data['Volume'] = np.add.reduceat(ohlc['Volume'].to_numpy(dtype=np.float64), self.starts)
+        return pd.DataFrame(data, index=ohlc.index[self.starts])
+
+    def positions(self, positions):
+        """Map row positions of the original frame to displayed candle positions"""
+        return self.bucket[np.asarray(positions, dtype=np.int64)]
+
+    def series(self, values, how='last'):
+        """
+        Decimate a line (e.g. support/resistance) aligned with the original frame
+
+        Args:
+            values: Series or array with one value per original bar
+            how: 'last' takes the value at the end of each bucket, 'mean' averages it
+
+        Returns:
+            Series indexed like self.ohlc
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if len(self.starts) == self.source_length:
+            return pd.Series(values, index=self.ohlc.index)
+        if how == 'last':
+            out = values[np.append(self.starts[1:], self.source_length) - 1]
+        elif how == 'mean':
+            valid = ~np.isnan(values)
+            sums = np.add.reduceat(np.where(valid, values, 0.0), self.starts)
+            counts = np.add.reduceat(valid.astype(np.int64), self.starts)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                out = sums / counts
+        else:
+            raise ValueError(f"how must be 'last' or 'mean', got {how!r}")
+        return pd.Series(out, index=self.ohlc.index)
+
+    def markers(self, positions, values):
+        """
+        Scatter series for mplfinance: `values` at the candles of `positions`, NaN elsewhere
+
+        Args:
+            positions: Row positions in the original frame
+            values: Series or array of marker prices aligned with the original frame
+        """
+        out = pd.Series(np.nan, index=self.ohlc.index)
+        positions = np.asarray(positions, dtype=np.int64)
+        if len(positions):
+            out.iloc[self.positions(positions)] = np.asarray(values, dtype=np.float64)[positions]
+        return out
+
+
+def decimate_ohlc(ohlc, max_bars=1500, keep=()):
+    """
+    Downsample an OHLC frame for display, keeping marked bars intact
+
+    Args:
+        ohlc: DataFrame with Open, High, Low, Close columns
+        max_bars: Target number of displayed candles
+        keep: Iterables of row positions that must remain individual candles
+
+    Returns:
+        Decimation; its .ohlc is the frame to plot
+    """
+    return Decimation(ohlc, max_bars, keep)
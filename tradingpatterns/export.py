@@ -0,0 +1,241 @@
+"""Columnar Parquet export of detection results
+
+Requires pyarrow, which is imported on first use so the rest of the package
+works without it.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+
+LABEL_COLUMNS = (
+    'head_shoulder_pattern',
+    'multiple_top_bottom_pattern',
+    'triangle_pattern',
+    'wedge_pattern',
+    'channel_pattern',
+    'double_pattern',
+    'signal',
+)
+VALUE_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume', 'support', 'resistance', 'slope', 'intercept')
+
+
+def _pyarrow():
+    """Import pyarrow and pyarrow.parquet, with a clear error when missing"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise ImportError("Parquet export requires pyarrow: pip install pyarrow") from exc
+    return pa, pq
+
+
+def export_schema():
+    """Arrow schema shared by every exported file"""
+    pa, _ = _pyarrow()
+    return pa.schema(
+        [pa.field('timestamp', pa.timestamp('ns'))]
+        + [pa.field(c, pa.float64()) for c in VALUE_COLUMNS]
+        + [pa.field(c, pa.dictionary(pa.int32(), pa.string())) for c in LABEL_COLUMNS]
+    )
+
+
+def _timestamps(df, time_column):
+    """Bar timestamps of a frame as a naive datetime64[ns] array"""
+    if time_column is not None:
+        ts = pd.to_datetime(df[time_column])
+    elif isinstance(df.index, pd.DatetimeIndex):
+        ts = df.index.to_series()
+    else:
+        raise ValueError("df needs a DatetimeIndex or a time_column to be partitioned by date")
+    if getattr(ts.dt, 'tz', None) is not None:
+        ts = ts.dt.tz_convert('UTC').dt.tz_localize(None)
+    return ts.to_numpy(dtype='datetime64[ns]')
+
+
+class PatternWriter:
+    """
+    Stream detector output to Parquet files partitioned by symbol and date
+
+    Files are laid out as ``root/symbol=<symbol>/date=<YYYY-MM-DD>/part-<n>.parquet``.
+    Rows are buffered per partition and written as row groups of
+    `row_group_size` rows, and at most `max_open_files` partitions are kept
+    open, so memory stays bounded however many bars are written. Pattern
+    label columns are dictionary-encoded; columns a frame does not have are
+    written as nulls so every file shares export_schema().
+
+    Args:
+        root: Output directory
+        row_group_size: Rows per Parquet row group
+        max_open_files: Partitions kept open before the least recently used is closed
+        compression: Parquet compression codec
+    """
+
+    def __init__(self, root, row_group_size=100_000, max_open_files=64, compression='zstd'):
+        self.root = root
+        self.row_group_size = row_group_size
+        self.max_open_files = max_open_files
+        self.compression = compression
+        self.schema = export_schema()
+        self.rows_written = 0
+        self._open = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, symbol, df, time_column=None):
+        """
+        Append detector output for one symbol
+
+        Args:
+            symbol: Symbol name
+            df: DataFrame returned by the detectors (any subset of the export columns)
+            time_column: Column holding bar timestamps; defaults to the DatetimeIndex
+        """
+        pa, _ = _pyarrow()
+        ts = _timestamps(df, time_column)
+        order = None if np.all(ts[1:] >= ts[:-1]) else np.argsort(ts, kind='stable')
+        # Each column is converted once into one table; in time order a day is
+        # a contiguous, zero-copy slice of it
+        arrays = [pa.array(ts, type=pa.timestamp('ns'))]
+        for c in VALUE_COLUMNS:
+            if c in df.columns:
+                arrays.append(pa.array(df[c].to_numpy(dtype=np.float64), type=pa.float64()))
+            else:
+                arrays.append(pa.nulls(len(ts), type=pa.float64()))
+        for c in LABEL_COLUMNS:
+            if c in df.columns:
+                values = df[c].to_numpy(dtype=object)
+                arrays.append(pa.array(values, type=pa.string(), from_pandas=True).dictionary_encode())
+            else:
+                arrays.append(pa.nulls(len(ts), type=pa.dictionary(pa.int32(), pa.string())))
+        table = pa.Table.from_arrays(arrays, schema=self.schema)
+        if order is not None:
+            table = table.take(order)
+            ts = ts[order]
+        days = ts.astype('datetime64[D]')
+        bounds = np.concatenate(([0], np.flatnonzero(days[1:] != days[:-1]) + 1, [len(days)]))
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            if hi > lo:
+                self._append((str(symbol), str(days[lo])), table.slice(lo, hi - lo))
+
+    def _append(self, partition, table):
+        """Buffer rows for a partition and emit full row groups"""
+        pa, pq = _pyarrow()
+        state = self._open.pop(partition, None)
+        if state is None:
+            if len(self._open) >= self.max_open_files:
+                self._close_partition(next(iter(self._open)))
+            symbol, day = partition
+            directory = os.path.join(self.root, f'symbol={symbol}', f'date={day}')
+            os.makedirs(directory, exist_ok=True)
+            part = sum(name.endswith('.parquet') for name in os.listdir(directory))
+            path = os.path.join(directory, f'part-{part}.parquet')
+            state = {
+                'writer': pq.ParquetWriter(path, self.schema, compression=self.compression),
+                'buffer': [],
+                'rows': 0,
+            }
+        # Re-inserting keeps self._open ordered from least to most recently used
+        self._open[partition] = state
+        state['buffer'].append(table)
+        state['rows'] += table.num_rows
+        if state['rows'] >= self.row_group_size:
+            buffered = pa.concat_tables(state['buffer'])
+            full = (buffered.num_rows // self.row_group_size) * self.row_group_size
+            state['writer'].write_table(buffered.slice(0, full), row_group_size=self.row_group_size)
+            rest = buffered.slice(full)
+            state['buffer'] = [rest] if rest.num_rows else []
+            state['rows'] = rest.num_rows
+            self.rows_written += full
+
+    def _close_partition(self, partition):
+        """Flush the remaining rows of a partition and close its file"""
+        pa, _ = _pyarrow()
+        state = self._open.pop(partition)
+        if state['rows']:
+            state['writer'].write_table(pa.concat_tables(state['buffer']), row_group_size=self.row_group_size)
+            self.rows_written += state['rows']
+        state['writer'].close()
+
+    def close(self):
+        """Flush and close every open partition"""
+        for partition in list(self._open):
+            self._close_partition(partition)
+
+
+def write_patterns(root, frames, **kwargs):
+    """
+    Export detector output for several symbols
+
+    Args:
+        root: Output directory
+        frames: Mapping of symbol -> DataFrame
+        **kwargs: Passed to PatternWriter
+
+    Returns:
+        Number of rows written
+    """
+    with PatternWriter(root, **kwargs) as writer:
+        for symbol, df in frames.items():
+            writer.write(symbol, df)
+    return writer.rows_written
+
+
+def read_patterns(root, symbols=None, start=None, end=None, patterns=None, columns=None):
+    """
+    Load exported results back, reading only the partitions and columns needed
+
+    Args:
+        root: Directory written by PatternWriter
+        symbols: Symbols to load (default: all)
+        start: First timestamp to include (inclusive)
+        end: Last timestamp to include (inclusive)
+        patterns: Only keep rows where a label column holds one of these labels,
+            e.g. ['Double Top', 'Head and Shoulder']
+        columns: Columns to load besides symbol and timestamp (default: all)
+
+    Returns:
+        DataFrame sorted by symbol and timestamp; label columns are categorical
+    """
+    pa, _ = _pyarrow()
+    import pyarrow.dataset as ds
+
+    partitioning = ds.partitioning(pa.schema([('symbol', pa.string()), ('date', pa.string())]), flavor='hive')
+    dataset = ds.dataset(root, format='parquet', partitioning=partitioning, schema=export_schema().append(
+        pa.field('symbol', pa.string())).append(pa.field('date', pa.string())))
+
+    condition = None
+
+    def _and(expr):
+        return expr if condition is None else condition & expr
+
+    if symbols is not None:
+        condition = _and(ds.field('symbol').isin([str(s) for s in symbols]))
+    if start is not None:
+        start = pd.Timestamp(start)
+        # The string comparison on the date partition prunes whole directories
+        condition = _and(ds.field('date') >= start.strftime('%Y-%m-%d'))
+        condition = _and(ds.field('timestamp') >= pa.scalar(start.value, type=pa.int64()).cast(pa.timestamp('ns')))
+    if end is not None:
+        end = pd.Timestamp(end)
+        condition = _and(ds.field('date') <= end.strftime('%Y-%m-%d'))
+        condition = _and(ds.field('timestamp') <= pa.scalar(end.value, type=pa.int64()).cast(pa.timestamp('ns')))
+    if patterns is not None:
+        # Filters may use columns that are not projected, so every label column
+        # is matched whatever `columns` selects
+        label_filter = None
+        for c in LABEL_COLUMNS:
+            expr = ds.field(c).cast(pa.string()).isin(list(patterns))
+            label_filter = expr if label_filter is None else label_filter | expr
+        condition = _and(label_filter)
+
+    selected = ['symbol', 'timestamp'] + [c for c in (columns or VALUE_COLUMNS + LABEL_COLUMNS) if c not in ('symbol', 'timestamp')]
+    table = dataset.to_table(columns=selected, filter=condition)
+    df = table.to_pandas()
+    return df.sort_values(['symbol', 'timestamp'], kind='stable').reset_index(drop=True)
@@ -0,0 +1,290 @@
+"""Blocked evaluation of compound pattern conditions
+
+A condition such as the double-top mask is written once as an expression
+tree over named input arrays, e.g.::
+
+    high = col('High')
+    mask = (rolling_max('High', 3) >= high.shift(1)) & (high < high.shift(-1))
+
+evaluate() then walks the bars in cache-sized blocks. Inside a block every
+node writes into a small scratch buffer from a pool (ufuncs with out=), and
+shifted or rolling inputs are read through views of the input arrays, so no
+full-length temporary is ever allocated: peak memory is the output plus a
+handful of block-sized buffers, whatever the input length.
+
+Semantics follow pandas: shifted-in and warm-up positions are NaN, and any
+comparison against NaN is False.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+BLOCK_SIZE = 1 << 14
+
+_ARITHMETIC = {'+': np.add, '-': np.subtract, '*': np.multiply, '/': np.true_divide}
+_COMPARISON = {'<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal, '==': np.equal}
+_LOGICAL = {'&': np.logical_and, '|': np.logical_or}
+
+
+class Expr:
+    """Base class of expression nodes; operators build larger expressions"""
+
+    def _binary(self, op, other, reverse=False):
+        other = other if isinstance(other, Expr) else Const(other)
+        return BinOp(op, other, self) if reverse else BinOp(op, self, other)
+
+    def __add__(self, other):
+        return self._binary('+', other)
+
+    def __radd__(self, other):
+        return self._binary('+', other, reverse=True)
+
+    def __sub__(self, other):
+        return self._binary('-', other)
+
+    def __rsub__(self, other):
+        return self._binary('-', other, reverse=True)
+
+    def __mul__(self, other):
+        return self._binary('*', other)
+
+    def __rmul__(self, other):
+        return self._binary('*', other, reverse=True)
+
+    def __truediv__(self, other):
+        return self._binary('/', other)
+
+    def __rtruediv__(self, other):
+        return self._binary('/', other, reverse=True)
+
+    def __lt__(self, other):
+        return self._binary('<', other)
+
+    def __le__(self, other):
+        return self._binary('<=', other)
+
+    def __gt__(self, other):
+        return self._binary('>', other)
+
+    def __ge__(self, other):
+        return self._binary('>=', other)
+
+    def __eq__(self, other):
+        return self._binary('==', other)
+
+    def __and__(self, other):
+        return self._binary('&', other)
+
+    def __or__(self, other):
+        return self._binary('|', other)
+
+    __hash__ = object.__hash__
+
+
+class Const(Expr):
+    """A scalar constant"""
+
+    def __init__(self, value):
+        self.value = value
+
+
+class Input(Expr):
+    """A named input array, optionally shifted like Series.shift(periods)"""
+
+    def __init__(self, name, periods=0):
+        self.name = name
+        self.periods = periods
+
+    def shift(self, periods):
+        return Input(self.name, self.periods + periods)
+
+
+class Rolling(Expr):
+    """Trailing rolling max or min of a named input"""
+
+    def __init__(self, func, name, window):
+        if func not in ('max', 'min'):
+            raise ValueError(f"unsupported rolling function {func!r}")
+        self.func = func
+        self.name = name
+        self.window = window
+
+
+class Trend(Expr):
+    """Sign of the change of a named input over each trailing window"""
+
+    def __init__(self, name, window):
+        self.name = name
+        self.window = window
+
+
+class BinOp(Expr):
+    """Arithmetic, comparison or logical combination of two expressions"""
+
+    def __init__(self, op, left, right):
+        self.op = op
+        self.left = left
+        self.right = right
+
+
+def col(name):
+    """Reference an input array by name"""
+    return Input(name)
+
+
+def rolling_max(name, window):
+    """Rolling maximum of an input, same as Series.rolling(window).max()"""
+    return Rolling('max', name, window)
+
+
+def rolling_min(name, window):
+    """Rolling minimum of an input, same as Series.rolling(window).min()"""
+    return Rolling('min', name, window)
+
+
+def trend(name, window):
+    """1, -1 or 0 for a rise, fall or no change over the window; NaN during warm-up"""
+    return Trend(name, window)
+
+
+class _Pool:
+    """Free lists of block-sized scratch buffers, one per dtype"""
+
+    def __init__(self, shape):
+        self.shape = shape
+        self.free = {}
+
+    def take(self, dtype, length):
+        stack = self.free.setdefault(np.dtype(dtype), [])
+        buf = stack.pop() if stack else np.empty(self.shape, dtype=dtype)
+        return buf[..., :length], buf
+
+    def give(self, buf):
+        if buf is not None:
+            self.free[buf.dtype].append(buf)
+
+
+def _fill_shifted(x, periods, a, b, out):
+    """Write x shifted by periods over positions [a, b) into out, NaN outside the data"""
+    n = x.shape[-1]
+    lo, hi = a - periods, b - periods
+    out[...] = np.nan
+    src_lo, src_hi = max(lo, 0), min(hi, n)
+    if src_lo < src_hi:
+        out[..., src_lo - lo:src_hi - lo] = x[..., src_lo:src_hi]
+
+
+def _eval(node, inputs, a, b, pool):
+    """Evaluate node over positions [a, b); returns (values, pooled buffer or None)"""
+    length = b - a
+    if isinstance(node, Const):
+        return node.value, None
+
+    if isinstance(node, Input):
+        x = inputs[node.name]
+        if a - node.periods >= 0 and b - node.periods <= x.shape[-1]:
+            return x[..., a - node.periods:b - node.periods], None
+        out, buf = pool.take(np.float64, length)
+        _fill_shifted(x, node.periods, a, b, out)
+        return out, buf
+
+    if isinstance(node, Rolling):
+        x = inputs[node.name]
+        w = node.window
+        out, buf = pool.take(np.float64, length)
+        first = max(a, w - 1)
+        out[..., :first - a] = np.nan
+        if first < b:
+            windows = sliding_window_view(x[..., first - w + 1:b], w, axis=-1)
+            reduce = np.max if node.func == 'max' else np.min
+            reduce(windows, axis=-1, out=out[..., first - a:])
+        return out, buf
+
+    if isinstance(node, Trend):
+        x = inputs[node.name]
+        w = node.window
+        out, buf = pool.take(np.float64, length)
+        first = max(a, w - 1)
+        out[..., :first - a] = np.nan
+        if first < b:
+            tail = out[..., first - a:]
+            np.subtract(x[..., first:b], x[..., first - w + 1:b - w + 1], out=tail)
+            np.sign(tail, out=tail)
+        return out, buf
+
+    left, left_buf = _eval(node.left, inputs, a, b, pool)
+    right, right_buf = _eval(node.right, inputs, a, b, pool)
+    if node.op in _ARITHMETIC:
+        func, dtype = _ARITHMETIC[node.op], np.float64
+    elif node.op in _COMPARISON:
+        func, dtype = _COMPARISON[node.op], np.bool_
+    else:
+        func, dtype = _LOGICAL[node.op], np.bool_
+
+    # Write into a child's buffer when the dtype allows, otherwise take a new one
+    if left_buf is not None and left_buf.dtype == dtype:
+        out, buf = left, left_buf
+        pool.give(right_buf)
+    elif right_buf is not None and right_buf.dtype == dtype:
+        out, buf = right, right_buf
+        pool.give(left_buf)
+    else:
+        out, buf = pool.take(dtype, length)
+        pool.give(left_buf)
+        pool.give(right_buf)
+    func(left, right, out=out)
+    return out, buf
+
+
+def evaluate(expr, inputs, block_size=BLOCK_SIZE, out=None):
+    """
+    Evaluate an expression over full-length inputs, one block at a time
+
+    Args:
+        expr: Expression built from col(), rolling_max(), rolling_min(), trend()
+        inputs: Mapping of name -> array; bars along the last axis
+        block_size: Bars per block
+        out: Optional preallocated result array
+
+    Returns:
+        Array of the expression's values (bool for conditions)
+    """
+    inputs = {k: np.asarray(v, dtype=np.float64) for k, v in inputs.items()}
+    shape = next(iter(inputs.values())).shape
+    pool = _Pool(shape[:-1] + (min(block_size, shape[-1]) or 1,))
+    for a in range(0, shape[-1], block_size):
+        b = min(a + block_size, shape[-1])
+        values, buf = _eval(expr, inputs, a, b, pool)
+        if out is None:
+            dtype = values.dtype if isinstance(values, np.ndarray) else np.asarray(values).dtype
+            out = np.empty(shape, dtype=dtype)
+        out[..., a:b] = values
+        pool.give(buf)
+    if out is None:
+        out = np.empty(shape, dtype=np.bool_)
+    return out
+
+
+def evaluate_codes(first, second, inputs, block_size=BLOCK_SIZE):
+    """
+    Evaluate two conditions into label codes, the second taking priority
+
+    Mirrors the detectors' ``df.loc[mask_a] = A; df.loc[mask_b] = B``: code 1
+    where only the first condition holds, 2 where the second holds, else 0.
+
+    Returns:
+        int8 array of codes
+    """
+    inputs = {k: np.asarray(v, dtype=np.float64) for k, v in inputs.items()}
+    shape = next(iter(inputs.values())).shape
+    codes = np.zeros(shape, dtype=np.int8)
+    pool = _Pool(shape[:-1] + (min(block_size, shape[-1]) or 1,))
+    for a in range(0, shape[-1], block_size):
+        b = min(a + block_size, shape[-1])
+        block = codes[..., a:b]
+        for code, expr in ((1, first), (2, second)):
+            mask, buf = _eval(expr, inputs, a, b, pool)
+            np.copyto(block, code, where=mask)
+            pool.give(buf)
+    return codes
@@ -0,0 +1,137 @@
+"""Append-aware incremental recomputation for the DataFrame detectors"""
+
+import inspect
+
+import numpy as np
+import pandas as pd
+
+from . import tradingpatterns as _detectors
+
+
+# Detectors whose output for a row also depends on where the frame starts
+FULL_RECOMPUTE = {'calculate_support_resistance'}
+
+# detector name -> window -> (rows of history a row depends on, rows of look-ahead)
+DETECTOR_SPANS = {
+    'detect_head_shoulder': lambda w: (max(w - 1, 1), 1),
+    'detect_multiple_tops_bottoms': lambda w: (max(w - 1, 1), 0),
+    'calculate_support_resistance': lambda w: (w - 1, 0),
+    'detect_triangle_pattern': lambda w: (max(w - 1, 1), 0),
+    'detect_wedge': lambda w: (max(w - 1, 1), 0),
+    'detect_channel': lambda w: (max(w - 1, 1), 0),
+    'detect_double_top_bottom': lambda w: (max(w - 1, 1), 1),
+    'detect_trendline': lambda w: (w, 0),
+    'find_pivots': lambda w: (1, 1),
+}
+
+
+def _trendline_tail(df, start, window):
+    """
+    Rows start: of detect_trendline(df) without touching the earlier rows
+
+    The trendline intercept is measured against the row number in the whole
+    frame, so the tail cannot be recomputed on a slice; this repeats the
+    detector's regression for the new rows only, using absolute positions.
+    """
+    tail = df.iloc[start:].copy()
+    tail['slope'] = np.nan
+    tail['intercept'] = np.nan
+    close = df['Close']
+    for i in range(max(window, start), len(df)):
+        x = np.array(range(i-window, i))
+        y = close.iloc[i-window:i]
+        A = np.vstack([x, np.ones(len(x))]).T
+        m, c = np.linalg.lstsq(A, y, rcond=None)[0]
+        tail.at[df.index[i], 'slope'] = m
+        tail.at[df.index[i], 'intercept'] = c
+    tail['support'] = np.nan
+    tail['resistance'] = np.nan
+    tail.loc[tail['slope'] > 0, 'support'] = tail['Close'] * tail['slope'] + tail['intercept']
+    tail.loc[tail['slope'] < 0, 'resistance'] = tail['Close'] * tail['slope'] + tail['intercept']
+    return tail
+
+
+class IncrementalDetector:
+    """
+    Keep a detector's output up to date as rows are appended
+
+    The detector's output for a row depends on a bounded number of earlier
+    rows (the rolling window) and, for detectors using ``shift(-1)``, on the
+    next row. After a full first run, every update only re-runs the detector
+    on the rows that are new or were previously waiting for their
+    look-ahead bar, plus the history they need, and splices that tail onto
+    the rows that are already final. The result is identical to running the
+    detector over the whole frame. calculate_support_resistance is always
+    run in full: pandas' rolling mean/std keep running sums whose rounding
+    depends on the first row, so a recomputed tail would not match.
+
+    Args:
+        detector: One of the functions in tradingpatterns.py, or any function
+            with the same df-in/df-out signature when lookback/lookahead are given
+        lookback: Rows of history each output row depends on (inferred for built-in detectors)
+        lookahead: Rows after each output row it depends on (inferred for built-in detectors)
+        **params: Keyword arguments passed to the detector, e.g. window=5
+    """
+
+    def __init__(self, detector, lookback=None, lookahead=None, **params):
+        self.detector = detector
+        self.params = params
+        if lookback is None or lookahead is None:
+            spans = DETECTOR_SPANS.get(detector.__name__)
+            if spans is None or getattr(_detectors, detector.__name__, None) is not detector:
+                raise ValueError(f"{detector.__name__}: pass lookback and lookahead for custom detectors")
+            default = inspect.signature(detector).parameters.get('window')
+            inferred = spans(params.get('window', default.default if default is not None else 0))
+            lookback = inferred[0] if lookback is None else lookback
+            lookahead = inferred[1] if lookahead is None else lookahead
+        self.lookback = lookback
+        self.lookahead = lookahead
+        self.result = None
+        self.columns = None
+        self.valid_rows = 0
+
+    def reset(self):
+        """Forget the cached output; the next update recomputes everything"""
+        self.result = None
+        self.columns = None
+        self.valid_rows = 0
+
+    def _is_append(self, df):
+        """True when df starts with exactly the rows seen last time"""
+        if self.result is None or len(df) < len(self.result) or len(self.result) == 0:
+            return False
+        if getattr(self.detector, '__name__', None) in FULL_RECOMPUTE:
+            return False
+        rows = len(self.result)
+        if list(df.columns[:len(self.columns)]) != self.columns or not df.index[:rows].equals(self.result.index):
+            return False
+        # Compare the input data itself: an equal-length or longer frame with the
+        # same index (e.g. a reloaded CSV) may still hold different values
+        return df[self.columns].iloc[:rows].equals(self.result[self.columns])
+
+    def update(self, df):
+        """
+        Detector output for df, recomputing only the affected tail
+
+        Args:
+            df: The full frame, i.e. the previous frame with rows appended.
+                Anything else (shorter, or a different prefix) triggers a full run.
+
+        Returns:
+            DataFrame identical to detector(df.copy(), **params)
+        """
+        if not self._is_append(df):
+            self.result = self.detector(df.copy(), **self.params)
+            self.columns = list(df.columns)
+        elif len(df) > len(self.result) and self.detector is _detectors.detect_trendline:
+            tail = _trendline_tail(df, self.valid_rows, self.params.get('window', 2))
+            self.result = pd.concat([self.result.iloc[:self.valid_rows], tail])
+        elif len(df) > len(self.result):
+            start = max(0, self.valid_rows - self.lookback)
+            tail = df.iloc[start:].reset_index(drop=True)
+            tail = self.detector(tail, **self.params)
+            tail.index = df.index[start:]
+            keep = self.valid_rows - start
+            self.result = pd.concat([self.result.iloc[:self.valid_rows], tail.iloc[keep:]])
+        self.valid_rows = max(0, len(self.result) - self.lookahead)
+        return self.result
@@ -0,0 +1,322 @@
+"""Walk-forward parameter search for the detectors and filter_best_patterns"""
+
+import itertools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from . import core
+from .core import (
+    head_shoulder_masks,
+    multiple_top_bottom_masks,
+    triangle_masks,
+    wedge_masks,
+    channel_masks,
+    double_masks
+)
+from .expr import col, evaluate_codes
+from .utils import cluster_and_select_best, filter_patterns_by_distance, filter_by_strength
+
+
+DEFAULT_GRID = {
+    'window': (3, 5, 10, 20),
+    'threshold': (0.02, 0.05, 0.1),
+    'cluster_distance': (5, 10, 20),
+    'min_distance': (5, 15, 30),
+    'max_patterns': (5, 10, 20),
+}
+
+# Expected move after code 1 and code 2 of each pattern (1 = long, -1 = short)
+PATTERN_DIRECTIONS = {
+    'head_shoulder': (-1, 1),
+    'multiple_top_bottom': (-1, 1),
+    'triangle': (1, -1),
+    'wedge': (1, -1),
+    'channel': (1, -1),
+    'double': (-1, 1),
+}
+
+PARAMETERS = ('window', 'threshold', 'cluster_distance', 'min_distance', 'max_patterns')
+
+# Per-process data set by _init_worker, plus label codes cached per (window, threshold)
+_DATA = {}
+_CODES = {}
+
+
+def _init_worker(ohlc, horizon):
+    """Load the price history once per process and precompute forward returns"""
+    _DATA.clear()
+    _CODES.clear()
+    close = ohlc['Close'].to_numpy(dtype=np.float64)
+    # A pattern at bar p needs bar p + 1 to be confirmed, so trades enter at its close
+    forward = np.full(len(close), np.nan)
+    if len(close) > horizon + 1:
+        forward[:-horizon - 1] = close[horizon + 1:] / close[1:-horizon] - 1
+    _DATA.update(
+        ohlc=ohlc,
+        high=ohlc['High'].to_numpy(dtype=np.float64),
+        low=ohlc['Low'].to_numpy(dtype=np.float64),
+        close=close,
+        forward=forward,
+        horizon=horizon,
+    )
+
+
+def _window_inputs(pattern, window):
+    """Rolling columns shared by every threshold and filter setting of one window"""
+    high, low, close = _DATA['high'], _DATA['low'], _DATA['close']
+    inputs = {
+        'High': high, 'Low': low, 'Close': close,
+        'high_roll_max': core.rolling_max(high, window),
+        'low_roll_min': core.rolling_min(low, window),
+    }
+    if pattern == 'multiple_top_bottom':
+        inputs['close_roll_max'] = core.rolling_max(close, window)
+        inputs['close_roll_min'] = core.rolling_min(close, window)
+    if pattern in ('wedge', 'channel'):
+        inputs['trend_high'] = core.trend(high, window)
+        inputs['trend_low'] = core.trend(low, window)
+    return inputs
+
+
+def _masks(pattern, threshold):
+    """Mask expressions of a pattern over the columns built by _window_inputs"""
+    high, low, close = col('High'), col('Low'), col('Close')
+    high_roll_max, low_roll_min = col('high_roll_max'), col('low_roll_min')
+    if pattern == 'head_shoulder':
+        return head_shoulder_masks(high, low, high_roll_max, low_roll_min)
+    if pattern == 'multiple_top_bottom':
+        return multiple_top_bottom_masks(high, low, close, high_roll_max, low_roll_min, col('close_roll_max'), col('close_roll_min'))
+    if pattern == 'triangle':
+        return triangle_masks(high, low, close, high_roll_max, low_roll_min)
+    if pattern == 'wedge':
+        return wedge_masks(high, low, high_roll_max, low_roll_min, col('trend_high'), col('trend_low'))
+    if pattern == 'channel':
+        return channel_masks(high, low, high_roll_max, low_roll_min, col('trend_high'), col('trend_low'))
+    if pattern == 'double':
+        return double_masks(high, low, high_roll_max, low_roll_min, threshold)
+    raise ValueError(f"Unknown pattern {pattern!r}, expected one of {tuple(PATTERN_DIRECTIONS)}")
+
+
+def _codes(pattern, window, thresholds):
+    """Label codes for every threshold of one window, computing the rolling columns once"""
+    missing = [t for t in thresholds if (window, t) not in _CODES]
+    if missing:
+        inputs = _window_inputs(pattern, window)
+        for threshold in missing:
+            _CODES[window, threshold] = evaluate_codes(*_masks(pattern, threshold), inputs)
+    return {t: _CODES[window, t] for t in thresholds}
+
+
+def _score_window(pattern, window, combos, folds, directions):
+    """
+    Trade statistics of all requested (combination, fold) pairs sharing one window
+
+    The filter stages run nested so that a clustering result is reused by every
+    min_distance, and a spaced result by every max_patterns.
+
+    Args:
+        combos: Mapping of (threshold, cluster_distance, min_distance, max_patterns) -> fold indices
+        folds: List of (start, end) bar ranges
+
+    Returns:
+        Dict of (combination, fold) -> (trades, sum of returns, sum of squared returns)
+    """
+    ohlc, forward, horizon = _DATA['ohlc'], _DATA['forward'], _DATA['horizon']
+    codes = _codes(pattern, window, sorted({c[0] for c in combos}))
+    results = {}
+    for threshold, fold in sorted({(c[0], f) for c, fs in combos.items() for f in fs}):
+        start, end = folds[fold]
+        # Only trades whose exit lies inside the fold are scored
+        segment = codes[threshold][start:max(start, end - horizon - 1)]
+        wanted = [c for c, fs in combos.items() if c[0] == threshold and fold in fs]
+        for code, direction in zip((1, 2), directions):
+            positions = np.flatnonzero(segment == code) + start
+            for cluster_distance, group in itertools.groupby(sorted(wanted, key=lambda c: c[1:]), key=lambda c: c[1]):
+                group = list(group)
+                clustered = cluster_and_select_best(positions, ohlc, cluster_distance)
+                for min_distance, subgroup in itertools.groupby(group, key=lambda c: c[2]):
+                    spaced = filter_patterns_by_distance(clustered, min_distance)
+                    for combo in subgroup:
+                        selected = spaced
+                        if len(selected) > combo[3]:
+                            selected = filter_by_strength(selected, ohlc, combo[3])
+                        returns = direction * forward[np.asarray(selected, dtype=np.int64)]
+                        n, total, squares = results.get((combo, fold), (0, 0.0, 0.0))
+                        results[combo, fold] = (n + len(returns), total + returns.sum(), squares + (returns * returns).sum())
+    return results
+
+
+def walk_forward_folds(length, folds=5, warmup=0):
+    """
+    Split bars [warmup, length) into consecutive, equally sized folds
+
+    optimize_parameters trains on the folds before each fold and tests on it.
+
+    Returns:
+        List of (start, end) bar ranges in time order
+    """
+    if folds < 1:
+        raise ValueError("folds must be at least 1")
+    edges = np.linspace(warmup, length, folds + 1).astype(np.int64)
+    return [(int(a), int(b)) for a, b in zip(edges[:-1], edges[1:])]
+
+
+def _score(stats, min_trades):
+    """t-statistic of the directional forward returns, NaN below min_trades"""
+    n, total, squares = stats
+    if n < max(min_trades, 2):
+        return np.nan, np.nan
+    mean = total / n
+    var = max(squares - n * mean * mean, 0.0) / (n - 1)
+    if var == 0:
+        return mean, np.nan
+    return mean, mean / math.sqrt(var) * math.sqrt(n)
+
+
+def optimize_parameters(ohlc, pattern='double', grid=None, folds=5, horizon=10, min_trades=5,
+                        eta=3, min_folds=1, directions=None, max_workers=None):
+    """
+    Walk-forward grid search of detector window/threshold and filter_best_patterns settings
+
+    The bars are split into `folds` consecutive folds. At every step the
+    combinations are ranked on the folds before one fold only, and the best
+    of them is then traded on that fold, which took no part in choosing it;
+    the per-step test results are the out-of-sample performance of the whole
+    procedure. A combination is scored by the t-statistic of the forward
+    returns of its filtered patterns, traded in the pattern's expected
+    direction for `horizon` bars, counting only trades that exit inside the
+    fold.
+
+    Successive halving keeps each selection cheap: all combinations are
+    first scored on the latest `min_folds` training folds, only the best
+    1/eta advance to eta times as many, and so on until the survivors have
+    seen the whole training prefix. Fold results are cached across steps.
+    Work is spread over a process pool in one task per (window, threshold,
+    fold); label codes are cached per worker, and the clustering/spacing
+    stages are shared between combinations within a task.
+
+    Args:
+        ohlc: DataFrame with High, Low, Close
+        pattern: Key of PATTERN_DIRECTIONS
+        grid: Mapping of parameter -> candidate values, defaults to DEFAULT_GRID
+        folds: Number of walk-forward folds; the first is only ever trained on
+        horizon: Forward return horizon in bars
+        min_trades: Combinations with fewer trades are ranked last
+        eta: Reduction factor per rung (keep 1/eta)
+        min_folds: Training folds evaluated in the first rung
+        directions: Expected direction of codes 1 and 2, overrides PATTERN_DIRECTIONS
+        max_workers: Process count; 1 runs in the calling process
+
+    Returns:
+        DataFrame with one row per test fold: fold, its bar range (test_start,
+        test_end), the selected parameters, their training trades and
+        train_score, and the out-of-sample trades, mean_return and score.
+        attrs['out_of_sample'] holds trades, mean_return and score pooled
+        over all test folds.
+    """
+    if pattern not in PATTERN_DIRECTIONS:
+        raise ValueError(f"Unknown pattern {pattern!r}, expected one of {tuple(PATTERN_DIRECTIONS)}")
+    if eta < 2:
+        raise ValueError("eta must be at least 2")
+    if folds < 2:
+        raise ValueError("folds must be at least 2, one to train on and one to test")
+    grid = {**DEFAULT_GRID, **(grid or {})}
+    unknown = set(grid) - set(PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown grid parameters {sorted(unknown)}, expected {PARAMETERS}")
+    if pattern != 'double':
+        # Only the double top/bottom detector has a threshold
+        grid['threshold'] = grid['threshold'][:1]
+    directions = directions or PATTERN_DIRECTIONS[pattern]
+
+    ohlc = ohlc[['High', 'Low', 'Close']].reset_index(drop=True)
+    fold_ranges = walk_forward_folds(len(ohlc), folds, warmup=max(grid['window']))
+    combos = list(itertools.product(*(grid[p] for p in PARAMETERS)))
+
+    max_workers = max_workers or os.cpu_count() or 1
+    executor = None
+    if max_workers > 1:
+        executor = ProcessPoolExecutor(max_workers, initializer=_init_worker, initargs=(ohlc, horizon))
+    else:
+        _init_worker(ohlc, horizon)
+
+    stats = {}
+    rows = []
+    pooled = (0, 0.0, 0.0)
+    try:
+        for test in range(1, folds):
+            # Successive halving over the training prefix, latest folds first
+            alive = combos
+            budget = min(min_folds, test)
+            while True:
+                training = range(test - budget, test)
+                _fill_stats(stats, [(c, f) for c in alive for f in training], executor, pattern, fold_ranges, directions)
+                alive = _rank(stats, alive, training, min_trades)
+                if budget == test:
+                    break
+                alive = alive[:max(1, math.ceil(len(alive) / eta))]
+                budget = min(budget * eta, test)
+
+            best = alive[0]
+            _fill_stats(stats, [(best, test)], executor, pattern, fold_ranges, directions)
+            train = _total(stats, best, range(test))
+            tested = stats[best, test]
+            pooled = tuple(p + t for p, t in zip(pooled, tested))
+            mean, score = _score(tested, min_trades)
+            rows.append(dict(fold=test, test_start=fold_ranges[test][0], test_end=fold_ranges[test][1],
+                             **dict(zip(PARAMETERS, best)), train_trades=train[0],
+                             train_score=_score(train, min_trades)[1],
+                             trades=tested[0], mean_return=mean, score=score))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    result = pd.DataFrame(rows)
+    mean, score = _score(pooled, min_trades)
+    result.attrs['out_of_sample'] = {'trades': pooled[0], 'mean_return': float(mean), 'score': float(score)}
+    return result
+
+
+def _fill_stats(stats, needed, executor, pattern, folds, directions):
+    """
+    Score the (combination, fold) pairs missing from stats
+
+    Work is split into one task per (window, threshold, fold), so a rung has
+    enough tasks to keep every worker busy; each worker caches the label
+    codes of a (window, threshold) it has computed, and inside a task the
+    clustering and spacing stages are still shared between combinations.
+    """
+    requests = {}
+    for combo, fold in needed:
+        if (combo, fold) not in stats:
+            requests.setdefault((combo[0], combo[1], fold), {})[combo[1:]] = [fold]
+    if executor is None:
+        batches = [_score_window(pattern, w, r, folds, directions) for (w, _, _), r in requests.items()]
+    else:
+        futures = [executor.submit(_score_window, pattern, w, r, folds, directions) for (w, _, _), r in requests.items()]
+        batches = [f.result() for f in futures]
+    for ((window, _, _), request), batch in zip(requests.items(), batches):
+        for (combo, fold), value in batch.items():
+            stats[(window,) + combo, fold] = value
+        for combo, fs in request.items():
+            for fold in fs:
+                stats.setdefault(((window,) + combo, fold), (0, 0.0, 0.0))
+
+
+def _rank(stats, combos, folds, min_trades):
+    """Combinations ordered by their score pooled over the given folds, best first"""
+    scores = {c: _score(_total(stats, c, folds), min_trades)[1] for c in combos}
+    return sorted(combos, key=lambda c: -np.inf if np.isnan(scores[c]) else scores[c], reverse=True)
+
+
+def _total(stats, combo, folds):
+    """Pool the per-fold trade statistics of a combination over the given folds"""
+    n, total, squares = 0, 0.0, 0.0
+    for fold in folds:
+        fn, ft, fs = stats[combo, fold]
+        n, total, squares = n + fn, total + ft, squares + fs
+    return n, total, squares
@@ -0,0 +1,374 @@
+"""Asyncio ingestion pipeline: replayed feed -> bounded queue -> detection -> sink"""
+
+import asyncio
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from .aggregator import BAR_FIELDS
+from .core import PATTERN_LABELS, PATTERN_LOOKAHEAD, pattern_codes
+from .state import SymbolStateStore
+
+
+class StageStats:
+    """
+    Counters and latency samples of one pipeline stage
+
+    Latencies are kept in a fixed-size ring of the most recent samples, so
+    long runs report recent percentiles without growing memory.
+
+    Args:
+        name: Stage name used in the report
+        samples: Number of latency samples kept
+    """
+
+    def __init__(self, name, samples=100_000):
+        self.name = name
+        self.items = 0
+        self.batches = 0
+        self.busy = 0.0
+        self.blocked = 0.0
+        self.max_depth = 0
+        self._latency = np.empty(samples)
+        self._latency_count = 0
+
+    def record_latency(self, values):
+        """Add latency samples in seconds"""
+        values = np.atleast_1d(np.asarray(values, dtype=np.float64))[-len(self._latency):]
+        slots = (self._latency_count + np.arange(len(values))) % len(self._latency)
+        self._latency[slots] = values
+        self._latency_count += len(values)
+
+    def summary(self, elapsed):
+        """
+        Throughput and latency percentiles
+
+        Args:
+            elapsed: Wall-clock duration of the run in seconds
+
+        Returns:
+            Dict of items, batches, per-second throughput, busy and blocked
+            seconds, peak queue depth and p50/p99/max latency in milliseconds
+        """
+        latency = self._latency[:min(self._latency_count, len(self._latency))] * 1e3
+        p50, p99, worst = np.percentile(latency, [50, 99, 100]) if len(latency) else (np.nan,) * 3
+        return {
+            'items': self.items,
+            'batches': self.batches,
+            'throughput': self.items / elapsed if elapsed > 0 else np.nan,
+            'busy': self.busy,
+            'blocked': self.blocked,
+            'max_depth': self.max_depth,
+            'p50_ms': p50,
+            'p99_ms': p99,
+            'max_ms': worst,
+        }
+
+
+class ReplaySource:
+    """
+    Replay a local bar file as a feed
+
+    Rows are grouped by timestamp and each group is emitted as one
+    cross-section event ``(time_ns, rows, bars, emitted_at)``: row numbers
+    into ``self.symbols``, a (len(rows), 5) array of Open, High, Low, Close,
+    Volume and the ``time.perf_counter()`` of emission. Groups are spaced by
+    their timestamp gaps divided by ``speed``; ``speed=None`` replays as fast
+    as the pipeline accepts.
+
+    Args:
+        path: CSV or Parquet file of bars
+        speed: Replay speed as a multiple of real time (e.g. 86400 plays one
+            day of bars per second), None for no pacing
+        symbol: Symbol of every row when the file has no symbol column;
+            defaults to the file name
+        time_column: Column holding bar timestamps
+        symbol_column: Column holding symbols, if the file covers several
+    """
+
+    def __init__(self, path, speed=None, symbol=None, time_column='Date', symbol_column='Symbol'):
+        if speed is not None and speed <= 0:
+            raise ValueError("speed must be positive or None")
+        if str(path).endswith('.parquet') or os.path.isdir(path):
+            bars = pd.read_parquet(path)
+        else:
+            bars = pd.read_csv(path)
+        if time_column not in bars.columns:
+            raise ValueError(f"{path}: missing time column {time_column!r}")
+        missing = {'Open', 'High', 'Low', 'Close'} - set(bars.columns)
+        if missing:
+            raise ValueError(f"{path}: missing columns {sorted(missing)}")
+
+        if symbol_column in bars.columns:
+            symbols = bars[symbol_column].astype(str)
+        else:
+            symbols = pd.Series(symbol or os.path.splitext(os.path.basename(str(path)))[0], index=bars.index)
+        times = pd.to_datetime(bars[time_column], utc=True).dt.tz_localize(None)
+        order = np.argsort(times.to_numpy(), kind='stable')
+
+        self.speed = speed
+        self.symbols, rows = np.unique(symbols.to_numpy()[order], return_inverse=True)
+        self.symbols = self.symbols.tolist()
+        self._times = times.to_numpy()[order].astype('datetime64[ns]').view(np.int64)
+        self._rows = rows.astype(np.int64)
+        self._bars = np.column_stack([
+            bars[f].to_numpy(dtype=np.float64)[order] if f in bars.columns else np.full(len(bars), np.nan)
+            for f in BAR_FIELDS
+        ])
+        # Start of each timestamp group
+        self._starts = np.flatnonzero(np.diff(self._times, prepend=self._times[:1] - 1))
+
+    def __len__(self):
+        return len(self._times)
+
+    async def run(self, queue, stats):
+        """Emit every group into queue, then None; waits whenever the queue is full"""
+        ends = np.append(self._starts[1:], len(self._times))
+        clock = time.perf_counter()
+        first = self._times[0] if len(self._times) else 0
+        for start, end in zip(self._starts, ends):
+            if self.speed is not None:
+                due = clock + (self._times[start] - first) / 1e9 / self.speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                # How far behind schedule the feed runs, e.g. because of backpressure
+                stats.record_latency(max(time.perf_counter() - due, 0.0))
+            event = (self._times[start], self._rows[start:end], self._bars[start:end], time.perf_counter())
+            waited = time.perf_counter()
+            await queue.put(event)
+            stats.blocked += time.perf_counter() - waited
+            stats.items += int(end - start)
+            stats.batches += 1
+            stats.max_depth = max(stats.max_depth, queue.qsize())
+        await queue.put(None)
+
+
+class DetectionStage:
+    """
+    Append arriving bars to per-symbol state and emit newly confirmed patterns
+
+    Events waiting in the inbox are drained together (up to max_batch), all
+    their bars are written into a SymbolStateStore, and each pattern is then
+    evaluated once for just the symbols that received bars, over only the
+    trailing bars the new labels depend on. Patterns without look-ahead are
+    labelled as soon as their bar arrives; head and shoulder and double
+    top/bottom look one bar ahead, so their label for a bar is final when the
+    next bar of the same symbol arrives. The emission time of the bar that
+    makes a label final is what end-to-end latency is measured from.
+
+    Args:
+        symbols: Symbol names, in the row order used by the source events
+        patterns: Keys of core.PATTERN_LABELS to evaluate
+        window: Rolling window of the detectors
+        threshold: Range threshold for the 'double' pattern
+        history: Bars kept per symbol
+        max_batch: Most events processed in one batch
+    """
+
+    def __init__(self, symbols, patterns=('head_shoulder', 'double'), window=3, threshold=0.05,
+                 history=256, max_batch=64):
+        bad = [p for p in patterns if p not in PATTERN_LABELS]
+        if bad:
+            raise ValueError(f"unknown patterns: {bad}")
+        if max_batch < 1 or history < max_batch + window + 1:
+            raise ValueError("history must hold max_batch + window + 1 bars")
+        self.patterns = tuple(patterns)
+        self.window = window
+        self.threshold = threshold
+        self.max_batch = max_batch
+        self.store = SymbolStateStore(symbols, window=history)
+        # Time and emission stamp of each symbol's newest bar, not yet confirmed
+        self._pending_time = np.zeros(len(symbols), dtype=np.int64)
+        self._pending_emitted = np.full(len(symbols), np.nan)
+
+    def process(self, events):
+        """
+        Ingest a batch of events
+
+        Returns:
+            List of signal dicts (symbol, pattern, label, time, emitted), where
+            time is the pattern bar and emitted the source time.perf_counter()
+            of the bar that confirmed it
+        """
+        symbols = self.store.symbols
+        new = np.zeros(len(symbols), dtype=np.int64)
+        confirmed = []
+        for bar_time, rows, bars, emitted in events:
+            self.store.update(bars, rows=rows)
+            new[rows] += 1
+            # Each new bar is final for patterns without look-ahead and confirms
+            # the previous bar of its symbol for the others
+            confirmed.append((rows, bar_time, self._pending_time[rows], self._pending_emitted[rows], emitted))
+            self._pending_time[rows] = bar_time
+            self._pending_emitted[rows] = emitted
+
+        updated = np.flatnonzero(new)
+        if not len(updated):
+            return []
+        # Evaluate only the updated symbols over the trailing bars the new labels need
+        last = int(new.max()) + self.window + 1
+        values = self.store.values(last, updated)
+        high, low, close = (values[:, :, self.store.fields.index(f)] for f in ('High', 'Low', 'Close'))
+        codes = {p: pattern_codes(p, high, low, close, self.window, self.threshold) for p in self.patterns}
+
+        slot = np.zeros(len(symbols), dtype=np.int64)
+        slot[updated] = np.arange(len(updated))
+        seen = np.zeros(len(symbols), dtype=np.int64)
+        signals = []
+        for rows, bar_time, times, previous, emitted in confirmed:
+            seen[rows] += 1
+            # Column of this event's bar, which is followed by new - seen later
+            # bars of the same symbol
+            column = last - 1 - (new[rows] - seen[rows])
+            has_previous = ~np.isnan(previous)
+            for pattern in self.patterns:
+                if PATTERN_LOOKAHEAD[pattern]:
+                    found = codes[pattern][slot[rows], column - 1]
+                    hits = np.flatnonzero((found > 0) & has_previous)
+                    stamps = times[hits]
+                else:
+                    found = codes[pattern][slot[rows], column]
+                    hits = np.flatnonzero(found > 0)
+                    stamps = np.full(len(hits), bar_time)
+                for j, stamp in zip(hits, stamps):
+                    signals.append({
+                        'symbol': symbols[rows[j]],
+                        'pattern': pattern,
+                        'label': PATTERN_LABELS[pattern][found[j]],
+                        'time': np.datetime64(int(stamp), 'ns'),
+                        'emitted': emitted,
+                    })
+        return signals
+
+    async def run(self, inbox, outbox, stats):
+        """Consume events until None, forwarding signal lists to outbox"""
+        loop = asyncio.get_running_loop()
+        done = False
+        while not done:
+            events = [await inbox.get()]
+            while len(events) < self.max_batch and not inbox.empty():
+                events.append(inbox.get_nowait())
+            if events[-1] is None:
+                events.pop()
+                done = True
+            if events:
+                started = time.perf_counter()
+                signals = await loop.run_in_executor(None, self.process, events)
+                finished = time.perf_counter()
+                stats.busy += finished - started
+                stats.items += sum(len(e[1]) for e in events)
+                stats.batches += 1
+                stats.record_latency([finished - e[3] for e in events])
+                waited = time.perf_counter()
+                await outbox.put(signals)
+                stats.blocked += time.perf_counter() - waited
+                stats.max_depth = max(stats.max_depth, outbox.qsize())
+        await outbox.put(None)
+
+
+class Pipeline:
+    """
+    Replay source -> bounded queue -> detection stage -> bounded queue -> sink
+
+    Both queues are bounded, so a slow stage makes the stages before it wait
+    (backpressure) instead of buffering without limit; the source's latency
+    shows how far the feed fell behind its replay schedule because of it.
+
+    Args:
+        source: ReplaySource (or any object with symbols and run(queue, stats))
+        stage: DetectionStage; defaults to one over source.symbols
+        sink: Callable or coroutine function receiving each signal dict, which
+            gets a 'latency' entry (bar-to-signal seconds); defaults to
+            appending to self.signals
+        queue_size: Capacity of each queue
+    """
+
+    def __init__(self, source, stage=None, sink=None, queue_size=1024):
+        self.source = source
+        self.stage = stage if stage is not None else DetectionStage(source.symbols)
+        self.signals = []
+        self.sink = sink if sink is not None else self.signals.append
+        self.queue_size = queue_size
+        self.stats = {}
+        self.elapsed = 0.0
+
+    async def _drain(self, inbox, stats):
+        """Deliver signals to the sink until None"""
+        is_async = asyncio.iscoroutinefunction(self.sink)
+        while True:
+            signals = await inbox.get()
+            if signals is None:
+                return
+            started = time.perf_counter()
+            for signal in signals:
+                signal['latency'] = time.perf_counter() - signal['emitted']
+                if is_async:
+                    await self.sink(signal)
+                else:
+                    self.sink(signal)
+            stats.busy += time.perf_counter() - started
+            stats.items += len(signals)
+            stats.batches += 1
+            stats.record_latency([s['latency'] for s in signals])
+
+    async def run(self):
+        """
+        Replay the whole source through the pipeline
+
+        Returns:
+            Report dict, see report()
+        """
+        events = asyncio.Queue(self.queue_size)
+        signals = asyncio.Queue(self.queue_size)
+        self.stats = {name: StageStats(name) for name in ('source', 'detect', 'sink')}
+        started = time.perf_counter()
+        await asyncio.gather(
+            self.source.run(events, self.stats['source']),
+            self.stage.run(events, signals, self.stats['detect']),
+            self._drain(signals, self.stats['sink']),
+        )
+        self.elapsed = time.perf_counter() - started
+        return self.report()
+
+    def report(self):
+        """
+        Per-stage summaries of the last run
+
+        Latency means: for 'source', lag behind the replay schedule; for
+        'detect', bar emission to end of its detection batch; for 'sink',
+        end-to-end bar-to-signal latency. Counts are bars for 'source' and
+        'detect' and signals for 'sink'.
+
+        Returns:
+            Dict of stage name -> StageStats.summary(), plus elapsed seconds
+        """
+        report = {name: stats.summary(self.elapsed) for name, stats in self.stats.items()}
+        report['elapsed'] = self.elapsed
+        return report
+
+
+def replay(path, speed=None, patterns=('head_shoulder', 'double'), window=3, threshold=0.05,
+           sink=None, queue_size=1024, max_batch=64, **source_args):
+    """
+    Replay a bar file through a detection pipeline and return its report
+
+    Args:
+        path: CSV or Parquet file of bars (see ReplaySource)
+        speed: Replay speed as a multiple of real time, None for no pacing
+        patterns, window, threshold, max_batch: DetectionStage settings
+        sink: Callable receiving each signal, see Pipeline
+        queue_size: Capacity of each queue
+        **source_args: Passed on to ReplaySource
+
+    Returns:
+        (report, signals) - signals is empty when a sink is given
+    """
+    source = ReplaySource(path, speed, **source_args)
+    stage = DetectionStage(source.symbols, patterns, window, threshold,
+                           history=max(256, max_batch + window + 1), max_batch=max_batch)
+    pipeline = Pipeline(source, stage, sink, queue_size)
+    report = asyncio.run(pipeline.run())
+    return report, pipeline.signals
@@ -0,0 +1,161 @@
+"""Streaming top-K ranking of pattern hits across many symbols"""
+
+import heapq
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from .utils import top_k_indices
+
+
+RANKING_COLUMNS = ('rank', 'symbol', 'pattern', 'position', 'time', 'strength')
+
+
+def _ranges(ohlc, positions):
+    """Bar range (High - Low) at row positions, the strength used by filter_by_strength"""
+    return ohlc['High'].to_numpy()[positions] - ohlc['Low'].to_numpy()[positions]
+
+
+class TopKRanker:
+    """
+    Bounded-memory global ranking of the strongest pattern hits
+
+    Hits are scored like filter_by_strength (High - Low of the pattern bar)
+    and kept in a min-heap of at most k entries, so memory stays O(k) however
+    many symbols and hits stream through. Each batch is first cut to the hits
+    that beat the current k-th strength and then to its own top k with a
+    partial partition, so adding n hits costs O(n + k log k). Among equal
+    strengths, hits added earlier rank first.
+
+    Args:
+        k: Number of hits to keep
+        on_update: Optional callable(ranker), called after an add that changed the top k
+    """
+
+    def __init__(self, k=100, on_update=None):
+        if k < 1:
+            raise ValueError("k must be at least 1")
+        self.k = k
+        self.on_update = on_update
+        self.heap = []
+        self.keys = set()
+        self.seen = 0
+        self._order = itertools.count()
+
+    def __len__(self):
+        return len(self.heap)
+
+    @property
+    def threshold(self):
+        """Strength a new hit must beat to enter, -inf until k hits are held"""
+        return self.heap[0][0] if len(self.heap) == self.k else -np.inf
+
+    def add(self, symbol, positions, ohlc, pattern=''):
+        """
+        Score hits of one symbol by their bar range and insert them
+
+        Args:
+            symbol: Symbol the positions belong to
+            positions: Row positions of the hits in ohlc
+            ohlc: DataFrame with High and Low
+            pattern: Pattern label of the hits
+
+        Returns:
+            Number of hits that entered the top k
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        return self.add_strengths(symbol, positions, _ranges(ohlc, positions), pattern, ohlc.index[positions])
+
+    def add_result(self, result, ohlc):
+        """
+        Insert one ScanService.scan() result, i.e. every label of one (symbol, detector)
+
+        Args:
+            result: Dict with symbol and patterns (label -> row positions)
+            ohlc: The symbol's DataFrame the positions refer to
+
+        Returns:
+            Number of hits that entered the top k
+        """
+        entered = 0
+        for label, positions in result['patterns'].items():
+            positions = np.asarray(positions, dtype=np.int64)
+            entered += self._insert(result['symbol'], positions, _ranges(ohlc, positions), label, ohlc.index[positions])
+        return self._notify(entered)
+
+    def add_strengths(self, symbol, positions, strengths, pattern='', times=None):
+        """
+        Insert hits with precomputed strengths
+
+        Args:
+            symbol: Symbol the positions belong to
+            positions: Row positions of the hits
+            strengths: Score of each hit, higher is stronger
+            pattern: Pattern label of the hits
+            times: Optional timestamps of the hits
+
+        Returns:
+            Number of hits that entered the top k
+        """
+        return self._notify(self._insert(symbol, positions, strengths, pattern, times))
+
+    def _insert(self, symbol, positions, strengths, pattern, times):
+        """Insert a batch of hits; returns how many entered the top k"""
+        positions = np.asarray(positions, dtype=np.int64)
+        strengths = np.asarray(strengths, dtype=np.float64)
+        if len(positions) != len(strengths):
+            raise ValueError("positions and strengths must have the same length")
+        self.seen += len(positions)
+
+        # Only hits that beat the current k-th strength can enter, and at most k
+        # of them plus the ones already held (which are skipped below)
+        candidates = np.flatnonzero(strengths > self.threshold)
+        limit = self.k + sum(1 for s, p, _ in self.keys if s == symbol and p == pattern)
+        if len(candidates) > limit:
+            candidates = candidates[top_k_indices(strengths[candidates], limit)]
+            candidates.sort()
+
+        entered = 0
+        for i in candidates:
+            key = (symbol, pattern, int(positions[i]))
+            if key in self.keys:
+                continue
+            entry = (float(strengths[i]), -next(self._order), symbol, pattern,
+                     int(positions[i]), None if times is None else times[i])
+            if len(self.heap) < self.k:
+                heapq.heappush(self.heap, entry)
+            elif entry > self.heap[0]:
+                evicted = heapq.heapreplace(self.heap, entry)
+                self.keys.discard((evicted[2], evicted[3], evicted[4]))
+            else:
+                continue
+            self.keys.add(key)
+            entered += 1
+        return entered
+
+    def _notify(self, entered):
+        """Call on_update when the top k changed"""
+        if entered and self.on_update is not None:
+            self.on_update(self)
+        return entered
+
+    def merge(self, other):
+        """Fold in the hits of another ranker, e.g. one filled by a parallel worker"""
+        entered = 0
+        for strength, _, symbol, pattern, position, time in sorted(other.heap, reverse=True):
+            entered += self._insert(symbol, [position], [strength], pattern, [time])
+        return self._notify(entered)
+
+    def ranked(self):
+        """
+        The current top k, strongest first
+
+        Returns:
+            DataFrame with rank, symbol, pattern, position, time and strength
+        """
+        entries = sorted(self.heap, reverse=True)
+        return pd.DataFrame(
+            [(rank, symbol, pattern, position, time, strength)
+             for rank, (strength, _, symbol, pattern, position, time) in enumerate(entries, 1)],
+            columns=list(RANKING_COLUMNS))
@@ -0,0 +1,267 @@
+"""Local asyncio scan service with request coalescing and batching"""
+
+import asyncio
+import json
+
+import numpy as np
+import pandas as pd
+
+from .core import PATTERN_LABELS, pattern_codes
+
+
+def _stack(frames, column):
+    """Stack one column of several frames into a (symbols x bars) matrix, NaN-padded at the front"""
+    length = max(len(f) for f in frames)
+    out = np.full((len(frames), length), np.nan)
+    for i, frame in enumerate(frames):
+        if len(frame):
+            out[i, length - len(frame):] = frame[column].to_numpy(dtype=np.float64)
+    return out
+
+
+def _names(values, field):
+    """Validate a list of names from a request; a bare string is not a list"""
+    if not isinstance(values, (list, tuple)) or not all(isinstance(v, str) for v in values):
+        raise ValueError(f"{field} must be a list of strings")
+    return list(values)
+
+
+def _json_object(body):
+    """Parse a request body that must be a JSON object"""
+    request = json.loads(body or b'{}')
+    if not isinstance(request, dict):
+        raise ValueError("request body must be a JSON object")
+    return request
+
+
+class ScanService:
+    """
+    In-memory OHLC store answering pattern scans for several local clients
+
+    Scans are split into one job per (detector, params). Jobs arriving within
+    `batch_delay` seconds of each other for the same detector and params are
+    merged into a single vectorized pass over the union of their symbols, and
+    a job identical to one still in flight awaits that job's result instead of
+    recomputing it. Front-padding the symbols to a common length keeps the
+    results identical to running each detector on each symbol separately.
+
+    Args:
+        data: Optional mapping of symbol -> OHLC DataFrame
+        batch_delay: Seconds to wait for compatible jobs before computing
+    """
+
+    def __init__(self, data=None, batch_delay=0.005):
+        self.data = {}
+        self.batch_delay = batch_delay
+        self.stats = {'requests': 0, 'jobs': 0, 'coalesced': 0, 'batches': 0}
+        self._inflight = {}
+        self._pending = {}
+        # Running batch tasks; the event loop only keeps weak references to tasks
+        self._tasks = set()
+        for symbol, ohlc in (data or {}).items():
+            self.load(symbol, ohlc)
+
+    def load(self, symbol, ohlc):
+        """
+        Add or replace the OHLC history of a symbol
+
+        Args:
+            symbol: Symbol name
+            ohlc: DataFrame with High, Low and Close columns, or a CSV path
+        """
+        if not isinstance(ohlc, pd.DataFrame):
+            ohlc = pd.read_csv(ohlc)
+        missing = {'High', 'Low', 'Close'} - set(ohlc.columns)
+        if missing:
+            raise ValueError(f"{symbol}: missing columns {sorted(missing)}")
+        self.data[symbol] = ohlc.reset_index(drop=True)
+
+    async def scan(self, symbols, detectors, params=None):
+        """
+        Run detectors over symbols, yielding one result per (symbol, detector)
+
+        Args:
+            symbols: Symbol names held by the service
+            detectors: Keys of core.PATTERN_LABELS
+            params: Detector parameters: window (default 3) and threshold (default 0.05)
+
+        Yields:
+            Dicts with symbol, detector and patterns (label -> row positions)
+        """
+        symbols = _names(symbols, 'symbols')
+        detectors = _names(detectors, 'detectors')
+        if params is not None and not isinstance(params, dict):
+            raise ValueError("params must be an object")
+        params = dict(params or {})
+        try:
+            window = int(params.get('window', 3))
+            threshold = float(params.get('threshold', 0.05))
+        except (TypeError, ValueError):
+            raise ValueError("params window must be an integer and threshold a number") from None
+        if window < 1:
+            raise ValueError(f"params window must be at least 1, got {window}")
+        unknown = [s for s in symbols if s not in self.data]
+        if unknown:
+            raise ValueError(f"unknown symbols: {unknown}")
+        bad = [d for d in detectors if d not in PATTERN_LABELS]
+        if bad:
+            raise ValueError(f"unknown detectors: {bad}")
+
+        self.stats['requests'] += 1
+        symbols = tuple(sorted(set(symbols)))
+        jobs = [self._job(detector, window, threshold, symbols) for detector in detectors]
+        for job in asyncio.as_completed(jobs):
+            detector, results = await job
+            for symbol in symbols:
+                yield {'symbol': symbol, 'detector': detector, 'patterns': results[symbol]}
+
+    async def _job(self, detector, window, threshold, symbols):
+        """Coalesce identical jobs and queue new ones into the current batch"""
+        key = (detector, window, threshold, symbols)
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats['coalesced'] += 1
+        else:
+            self.stats['jobs'] += 1
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[key] = future
+            batch_key = (detector, window, threshold)
+            batch = self._pending.get(batch_key)
+            if batch is None:
+                batch = self._pending[batch_key] = []
+                asyncio.get_running_loop().call_later(self.batch_delay, self._start_batch, batch_key)
+            batch.append((key, symbols, future))
+        return detector, await asyncio.shield(future)
+
+    def _start_batch(self, batch_key):
+        """Start the task computing a batch and hold it until it finishes"""
+        task = asyncio.ensure_future(self._run_batch(batch_key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch_key):
+        """Compute one vectorized pass for every job queued under batch_key"""
+        batch = self._pending.pop(batch_key)
+        detector, window, threshold = batch_key
+        union = sorted({s for _, symbols, _ in batch for s in symbols})
+        self.stats['batches'] += 1
+        try:
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(None, self._evaluate, detector, window, threshold, union)
+        except Exception as exc:
+            for key, _, future in batch:
+                self._inflight.pop(key, None)
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for key, symbols, future in batch:
+            self._inflight.pop(key, None)
+            if not future.done():
+                future.set_result({s: results[s] for s in symbols})
+
+    def _evaluate(self, detector, window, threshold, symbols):
+        """Evaluate one detector for many symbols in a single matrix pass"""
+        frames = [self.data[s] for s in symbols]
+        high, low, close = (_stack(frames, c) for c in ('High', 'Low', 'Close'))
+        codes = pattern_codes(detector, high, low, close, window, threshold)
+        labels = PATTERN_LABELS[detector]
+        results = {}
+        for row, (symbol, frame) in enumerate(zip(symbols, frames)):
+            pad = codes.shape[1] - len(frame)
+            results[symbol] = {
+                labels[c]: (np.flatnonzero(codes[row] == c) - pad).tolist()
+                for c in range(1, len(labels))
+            }
+        return results
+
+    async def _handle(self, reader, writer):
+        """Serve one HTTP/1.1 request"""
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            if len(request_line) < 2:
+                return
+            method, path = request_line[0], request_line[1]
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+            if method == 'GET' and path == '/health':
+                await self._respond(writer, 200, {'status': 'ok'})
+            elif method == 'GET' and path == '/symbols':
+                await self._respond(writer, 200, {s: len(f) for s, f in self.data.items()})
+            elif method == 'GET' and path == '/stats':
+                await self._respond(writer, 200, self.stats)
+            elif method == 'POST' and path == '/load':
+                request = _json_object(body)
+                if not isinstance(request.get('symbol'), str) or not isinstance(request.get('path'), str):
+                    raise ValueError("symbol and path must be strings")
+                self.load(request['symbol'], request['path'])
+                await self._respond(writer, 200, {'symbol': request['symbol'], 'bars': len(self.data[request['symbol']])})
+            elif method == 'POST' and path == '/scan':
+                await self._stream_scan(writer, _json_object(body))
+            else:
+                await self._respond(writer, 404, {'error': f'no route for {method} {path}'})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except (KeyError, TypeError, ValueError, OSError) as exc:
+            # OSError covers a missing or unreadable file in POST /load
+            await self._respond(writer, 400, {'error': str(exc)})
+        except Exception as exc:
+            # Failures after the headers are handled in _stream_scan, so none have been sent yet
+            await self._respond(writer, 500, {'error': str(exc)})
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload):
+        """Write a complete JSON response"""
+        body = json.dumps(payload).encode()
+        writer.write(
+            f'HTTP/1.1 {status} {"OK" if status == 200 else "Error"}\r\n'
+            f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\n'
+            'Connection: close\r\n\r\n'.encode() + body)
+        await writer.drain()
+
+    async def _stream_scan(self, writer, request):
+        """Stream scan results as chunked newline-delimited JSON"""
+        results = self.scan(request.get('symbols', []), request.get('detectors', []), request.get('params'))
+        # Fetch the first result before sending headers so bad requests still get a 400
+        first = await anext(results, None)
+        writer.write(
+            b'HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n'
+            b'Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n')
+        item = first
+        try:
+            while item is not None:
+                await self._write_chunk(writer, item)
+                item = await anext(results, None)
+        except (ConnectionError, asyncio.CancelledError):
+            raise
+        except Exception as exc:
+            # The status line is already sent; end the stream with an error record instead
+            await self._write_chunk(writer, {'error': str(exc)})
+        writer.write(b'0\r\n\r\n')
+        await writer.drain()
+
+    async def _write_chunk(self, writer, item):
+        """Write one NDJSON record as an HTTP chunk"""
+        line = json.dumps(item).encode() + b'\n'
+        writer.write(f'{len(line):x}\r\n'.encode() + line + b'\r\n')
+        await writer.drain()
+
+    async def serve(self, host='127.0.0.1', port=0):
+        """
+        Start listening for HTTP requests
+
+        Args:
+            host: Interface to bind, localhost by default
+            port: TCP port, 0 picks a free one
+
+        Returns:
+            asyncio.Server; its bound port is server.sockets[0].getsockname()[1]
+        """
+        return await asyncio.start_server(self._handle, host, port)
@@ -0,0 +1,401 @@
+"""Historical shape similarity search over z-normalized OHLC windows"""
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+OHLC_FIELDS = ('Open', 'High', 'Low', 'Close')
+
+
+def _as_2d(values):
+    """View a 1-D series as a single-field (n, 1) array"""
+    values = np.asarray(values, dtype=np.float64)
+    return values[:, None] if values.ndim == 1 else values
+
+
+def _window_std(x, m):
+    """
+    Standard deviation of every length-m window of a 1-D array
+
+    The cumulative sums are taken after centering on the first value so that
+    prices far from zero do not lose precision in the sum of squares.
+    """
+    x = x - x[0]
+    cs = np.concatenate(([0.0], np.cumsum(x)))
+    cs2 = np.concatenate(([0.0], np.cumsum(x * x)))
+    mean = (cs[m:] - cs[:-m]) / m
+    var = (cs2[m:] - cs2[:-m]) / m - mean * mean
+    return np.sqrt(np.maximum(var, 0.0))
+
+
+# Longest query correlated directly instead of through the FFT
+_DIRECT_MAX = 64
+
+
+def sliding_distance(query, series, chunk_size=1 << 20):
+    """
+    z-normalized Euclidean distance between a query and every window of a series
+
+    Uses the FFT-based sliding dot product (MASS), or a direct correlation for
+    queries of up to 64 bars, processed in chunks so the FFT size and memory
+    stay bounded for very long histories. Multi-field inputs add up the
+    squared per-field distances.
+
+    Args:
+        query: Array (m,) or (m, fields)
+        series: Array (n,) or (n, fields)
+        chunk_size: Number of window starts handled per FFT
+
+    Returns:
+        Array (n - m + 1,) of distances; windows with a flat field are inf
+    """
+    query = _as_2d(query)
+    series = _as_2d(series)
+    m, n = len(query), len(series)
+    if query.shape[1] != series.shape[1]:
+        raise ValueError("query and series must have the same number of fields")
+    if n < m:
+        return np.empty(0)
+
+    q_mean = query.mean(axis=0)
+    q_std = query.std(axis=0)
+    if np.any(q_std == 0):
+        raise ValueError("query has a flat field and cannot be z-normalized")
+    q_norm = (query - q_mean) / q_std
+
+    total = n - m + 1
+    dist2 = np.zeros(total)
+    for start in range(0, total, chunk_size):
+        stop = min(start + chunk_size, total)
+        chunk = series[start:stop + m - 1]
+        size = 1 << int(np.ceil(np.log2(len(chunk) + m)))
+        for f in range(series.shape[1]):
+            x = chunk[:, f]
+            std = _window_std(x, m)
+            # Correlating with the normalized query makes the window mean drop out;
+            # short queries are cheaper (and more precise) correlated directly
+            if m <= _DIRECT_MAX:
+                qt = np.correlate(x - x.mean(), q_norm[:, f], 'valid')
+            else:
+                qt = np.fft.irfft(np.fft.rfft(x - x.mean(), size) * np.fft.rfft(q_norm[::-1, f], size), size)[m - 1:len(x)]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                corr = qt / (m * std)
+            d2 = 2 * m * (1 - corr)
+            d2[std <= 1e-12 * max(np.abs(x).max(), 1.0)] = np.inf
+            dist2[start:stop] += np.maximum(d2, 0.0)
+    return np.sqrt(dist2)
+
+
+def _pick_top_k(starts, dists, k, exclusion, banned=None):
+    """Greedily take the k closest starts that are at least `exclusion` apart"""
+    # Every pick and the banned start block fewer than 2 * exclusion starts, so
+    # the picks lie among the k * 2 * exclusion closest and only those are sorted
+    limit = k * max(2 * exclusion, 1)
+    if len(dists) > limit:
+        candidates = np.flatnonzero(dists <= np.partition(dists, limit - 1)[limit - 1])
+        order = candidates[np.argsort(dists[candidates], kind='stable')]
+    else:
+        order = np.argsort(dists, kind='stable')
+    chosen = []
+    for i in order:
+        if not np.isfinite(dists[i]):
+            break
+        s = starts[i]
+        if banned is not None and abs(s - banned) < exclusion:
+            continue
+        if any(abs(s - c) < exclusion for c, _ in chosen):
+            continue
+        chosen.append((s, dists[i]))
+        if len(chosen) == k:
+            break
+    return chosen
+
+
+# Relative slack added to every PAA box to absorb rounding in the running sums
+_MARGIN = 1e-6
+
+
+def _round_out(lower, upper):
+    """Store group bounds as float32, rounded outwards so they stay valid bounds"""
+    lower32 = lower.astype(np.float32)
+    upper32 = upper.astype(np.float32)
+    finite = np.isfinite(lower32)
+    lower32[finite] = np.nextafter(lower32[finite], np.float32(-np.inf))
+    finite = np.isfinite(upper32)
+    upper32[finite] = np.nextafter(upper32[finite], np.float32(np.inf))
+    return lower32, upper32
+
+
+def _group_bounds(lower, upper, size):
+    """Per-dimension min of lower and max of upper over consecutive groups of `size` rows"""
+    pad = -len(lower) % size
+    if pad:
+        lower = np.concatenate((lower, np.full((pad, lower.shape[1]), np.inf, dtype=lower.dtype)))
+        upper = np.concatenate((upper, np.full((pad, upper.shape[1]), -np.inf, dtype=upper.dtype)))
+    return (lower.reshape(-1, size, lower.shape[1]).min(axis=1),
+            upper.reshape(-1, size, upper.shape[1]).max(axis=1))
+
+
+class SimilarityIndex:
+    """
+    Exact top-K nearest past windows for detected pattern positions
+
+    Every window is reduced to the piecewise aggregate (PAA) of its
+    z-normalized fields. The scaled distance between two PAA vectors is a
+    lower bound of the z-normalized Euclidean distance of the windows, so the
+    index stores, for each group of `stride` consecutive window starts, the
+    per-segment range [min, max] of their PAA values; the distance from the
+    query's PAA to that box bounds every window in the group.
+
+    A query bounds every box, computes exact distances for the windows of
+    each group in lower-bound order, and stops once the next bound exceeds
+    the k-th exact distance found, so the result equals a full scan
+    (query(exact=True), up to floating point rounding). When the bounds
+    leave more than scan_fraction of the windows to check, the query
+    switches to the scan.
+
+    Query time stays linear in the history length and does not reach
+    sub-second latency on 100M bars. Bounding the boxes alone is a pass over
+    all n / stride groups, and on random-walk prices the bounds leave a
+    large share of windows to refine: with the defaults, k=10 and one CPU,
+    queries averaged 0.45 s on 2M bars and 3.1 s on 10M bars, against 0.42 s
+    and 2.6 s for the full scan. The index only pays off on data whose
+    windows the PAA bounds separate well.
+
+    Positions follow filter_best_patterns: integer rows of `ohlc`, and the
+    query window is the `window` bars ending at that row.
+
+    Args:
+        ohlc: DataFrame (or array) with the OHLC history
+        window: Length of the compared windows in bars
+        fields: Columns compared when ohlc is a DataFrame
+        segments: PAA segments per field; must divide window
+        stride: Window starts per bounded group; the bounds take
+            8 * fields * segments / stride bytes per bar (32 with the
+            defaults), and larger groups use less memory but prune less
+        scan_fraction: Share of all windows a query may refine before it
+            switches to a full scan, for data where the bounds prune poorly
+        chunk_size: Number of windows sketched per block while building
+    """
+
+    def __init__(self, ohlc, window=32, fields=OHLC_FIELDS, segments=8, stride=8,
+                 scan_fraction=0.25, chunk_size=1 << 20):
+        if window % segments:
+            raise ValueError("window must be a multiple of segments")
+        values = ohlc[list(fields)].to_numpy(dtype=np.float64) if isinstance(ohlc, pd.DataFrame) else ohlc
+        self.values = _as_2d(values)
+        self.window = window
+        self.segments = segments
+        self.stride = max(1, stride)
+        self.scan_fraction = scan_fraction
+        self.n_windows = max(len(self.values) - window + 1, 0)
+        self.lower, self.upper = self._build(chunk_size)
+
+    @property
+    def nbytes(self):
+        """Memory held by the bound arrays"""
+        return sum(a.nbytes for a in (self.lower, self.upper))
+
+    def _sketch(self, starts, block=4096):
+        """
+        z-normalized PAA of the windows at consecutive starts
+
+        Running sums are re-centered every `block` starts so the window
+        variances keep their precision on long histories.
+
+        Returns:
+            (paa, flat, unstable): paa is (len(starts), fields * segments);
+            flat marks windows with a constant field, whose distance is inf;
+            unstable marks nearly flat ones whose PAA is not trusted
+        """
+        m, seg_len = self.window, self.window // self.segments
+        n_fields = self.values.shape[1]
+        out = np.empty((len(starts), n_fields * self.segments))
+        flat = np.zeros(len(starts), dtype=bool)
+        unstable = np.zeros(len(starts), dtype=bool)
+        offsets = np.arange(self.segments + 1) * seg_len
+        for lo in range(0, len(starts), block):
+            local = starts[lo:lo + block] - starts[lo]
+            values = self.values[starts[lo]:starts[lo] + local[-1] + m]
+            rows = slice(lo, lo + len(local))
+            for f in range(n_fields):
+                x = values[:, f] - values[0, f]
+                cs = np.concatenate(([0.0], np.cumsum(x)))
+                cs2 = np.concatenate(([0.0], np.cumsum(x * x)))
+                mean = (cs[local + m] - cs[local]) / m
+                std = np.sqrt(np.maximum((cs2[local + m] - cs2[local]) / m - mean * mean, 0.0))
+                paa = np.diff(cs[local[:, None] + offsets], axis=1) / seg_len
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    out[rows, f * self.segments:(f + 1) * self.segments] = (paa - mean[:, None]) / std[:, None]
+                # Constant windows are detected exactly from the count of price changes
+                changes = np.concatenate(([0], np.cumsum(values[1:, f] != values[:-1, f])))
+                flat[rows] |= changes[local + m - 1] == changes[local]
+                unstable[rows] |= std <= 1e-9 * max(np.abs(values[:, f]).max(), 1.0)
+        return out, flat, unstable
+
+    def _build(self, chunk_size):
+        """Per-group PAA boxes, sketching whole groups chunk by chunk"""
+        dims = self.values.shape[1] * self.segments
+        n_groups = -(-self.n_windows // self.stride)
+        lower = np.empty((n_groups, dims), dtype=np.float32)
+        upper = np.empty((n_groups, dims), dtype=np.float32)
+        step = max(1, chunk_size // self.stride) * self.stride
+        for lo in range(0, self.n_windows, step):
+            z, flat, unstable = self._sketch(np.arange(lo, min(lo + step, self.n_windows)))
+            # Flat windows are never matched, so they must not widen a box; nearly
+            # flat ones get an unbounded box so they are always checked exactly
+            with np.errstate(invalid='ignore'):
+                z_lo = np.where(flat[:, None], np.inf, np.where(unstable[:, None], -np.inf, z - _MARGIN * (1 + np.abs(z))))
+                z_hi = np.where(flat[:, None], -np.inf, np.where(unstable[:, None], np.inf, z + _MARGIN * (1 + np.abs(z))))
+            g_lo, g_hi = _group_bounds(z_lo, z_hi, self.stride)
+            first = lo // self.stride
+            lower[first:first + len(g_lo)], upper[first:first + len(g_hi)] = _round_out(g_lo, g_hi)
+        return lower, upper
+
+    def _bound(self, q_sketch, lower, upper):
+        """Lower bound of the distance from the query to any window inside each box"""
+        gap = np.maximum(lower - q_sketch, 0.0) + np.maximum(q_sketch - upper, 0.0)
+        with np.errstate(invalid='ignore', over='ignore'):
+            return np.sqrt((self.window // self.segments) * (gap * gap).sum(axis=1))
+
+    def _exact(self, q_norm, groups):
+        """
+        Exact z-normalized distances of every window in the given groups
+
+        Each group's windows overlap, so they are read as one block of
+        stride + window - 1 bars and scored with sliding dot products against
+        the normalized query, the same correlation form sliding_distance uses.
+
+        Returns:
+            (starts, distances) of the windows, flat windows at inf
+        """
+        m, n_fields = self.window, self.values.shape[1]
+        first = groups * self.stride
+        rows = np.minimum(first[:, None] + np.arange(self.stride + m - 1), len(self.values) - 1)
+        raw = self.values[rows]
+        block = raw - raw[:, :1]
+        zero = np.zeros((len(groups), 1, n_fields))
+        cs = np.concatenate((zero, np.cumsum(block, axis=1)), axis=1)
+        cs2 = np.concatenate((zero, np.cumsum(block * block, axis=1)), axis=1)
+        mean = (cs[:, m:] - cs[:, :-m]) / m
+        std = np.sqrt(np.maximum((cs2[:, m:] - cs2[:, :-m]) / m - mean * mean, 0.0))
+        # (fields, groups, starts, m) @ (fields, 1, m, 1) -> (groups, starts, fields)
+        windows = sliding_window_view(np.ascontiguousarray(block.transpose(2, 0, 1)), m, axis=2)
+        dot = (windows @ q_norm.T[:, None, :, None])[..., 0].transpose(1, 2, 0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            d2 = (2 * m * (1 - dot / (m * std))).sum(axis=2)
+        d = np.sqrt(np.maximum(d2, 0.0))
+        d[~(std > 1e-12 * np.maximum(np.abs(raw).max(axis=1), 1.0)[:, None, :]).all(axis=2)] = np.inf
+        starts = first[:, None] + np.arange(self.stride)
+        valid = starts < self.n_windows
+        return starts[valid], d[valid]
+
+    def _search(self, q_norm, k, exclusion, banned, batch=256, chunk=1 << 16):
+        """
+        Refine groups in lower-bound order; returns the k matches as (start, distance)
+
+        The `batch` groups with the smallest bounds are refined first. Every
+        group whose bound is below the k-th distance found then still has to
+        be checked, so if those hold more than scan_fraction of all windows
+        the query returns None and a full scan is used instead. Otherwise
+        groups are refined in bound order until the next bound exceeds the
+        k-th exact distance.
+
+        That k-th distance can grow when a closer window excludes earlier
+        picks, so groups and candidates are pruned with a bound that only
+        shrinks: the distance of the k * 2 * exclusion-th closest window
+        refined so far, among which _pick_top_k finds its picks.
+        """
+        seg_len = self.window // self.segments
+        q_sketch = q_norm.reshape(self.segments, seg_len, -1).mean(axis=1).T.ravel()
+        keep_count = k * max(2 * exclusion, 1)
+        bounds = np.concatenate([np.empty(0)] + [
+            self._bound(q_sketch, self.lower[lo:lo + chunk], self.upper[lo:lo + chunk])
+            for lo in range(0, len(self.lower), chunk)])
+
+        first = np.arange(len(bounds)) if len(bounds) <= batch else np.argpartition(bounds, batch)[:batch]
+        first = first[np.isfinite(bounds[first])]
+        starts, dists = self._exact(q_norm, first)
+        prune, kth = np.inf, np.inf
+        bounds[first] = np.inf
+        todo, position = None, 0
+        while True:
+            if len(dists) > keep_count:
+                prune = np.partition(dists, keep_count - 1)[keep_count - 1]
+                keep = dists <= prune
+                starts, dists = starts[keep], dists[keep]
+            _, kth = self._select(starts, dists, k, exclusion, banned)
+            if todo is None:
+                # Groups that can still hold a match; too many means the bounds
+                # do not prune on this data and a full scan is cheaper
+                if np.count_nonzero(bounds <= kth) * self.stride > self.scan_fraction * self.n_windows:
+                    return None
+                todo = np.flatnonzero(bounds <= prune)
+                todo = todo[np.argsort(bounds[todo], kind='stable')]
+            groups = todo[position:position + batch]
+            groups = groups[bounds[groups] <= min(kth, prune)]
+            if not len(groups):
+                break
+            position += batch
+            group_starts, group_dists = self._exact(q_norm, groups)
+            starts = np.concatenate((starts, group_starts))
+            dists = np.concatenate((dists, group_dists))
+        chosen, _ = self._select(starts, dists, k, exclusion, banned)
+        return chosen
+
+    @staticmethod
+    def _select(starts, dists, k, exclusion, banned):
+        """Greedy top-k over the refined windows and the k-th distance (inf if fewer)"""
+        order = np.argsort(starts, kind='stable')
+        chosen = _pick_top_k(starts[order], dists[order], k, exclusion, banned)
+        return chosen, chosen[-1][1] if len(chosen) == k else np.inf
+
+    def query(self, positions, k=5, exact=False, exclusion=None, horizon=None):
+        """
+        Find the k most similar windows for each pattern position
+
+        Args:
+            positions: Pattern rows, e.g. the output of filter_best_patterns
+            k: Number of matches per position
+            exact: Scan the whole history with sliding_distance instead of the
+                index (same result, useful as a reference)
+            exclusion: Minimum distance in bars between the query and a match and
+                between matches (default window // 2)
+            horizon: If given, add the return of the last field (Close by default)
+                over this many bars after each match
+
+        Returns:
+            DataFrame with columns position, match, distance (and forward_return),
+            where match is the row at which the similar window ends. Positions
+            without a full window before them are skipped.
+        """
+        m = self.window
+        exclusion = m // 2 if exclusion is None else exclusion
+        rows = []
+        for pos in np.atleast_1d(positions):
+            pos = int(pos)
+            q_start = pos - m + 1
+            if q_start < 0 or pos >= len(self.values):
+                continue
+            query = self.values[q_start:pos + 1]
+            q_std = query.std(axis=0)
+            if np.any(q_std == 0):
+                continue
+            q_norm = (query - query.mean(axis=0)) / q_std
+
+            matches = None if exact else self._search(q_norm, k, exclusion, q_start)
+            if matches is None:
+                dists = sliding_distance(query, self.values)
+                matches = _pick_top_k(np.arange(len(dists)), dists, k, exclusion, banned=q_start)
+
+            for start, dist in matches:
+                row = {'position': pos, 'match': int(start) + m - 1, 'distance': float(dist)}
+                if horizon is not None:
+                    end = row['match']
+                    close = self.values[:, -1]
+                    row['forward_return'] = close[end + horizon] / close[end] - 1 if end + horizon < len(close) else np.nan
+                rows.append(row)
+
+        columns = ['position', 'match', 'distance'] + (['forward_return'] if horizon is not None else [])
+        return pd.DataFrame(rows, columns=columns)
@@ -0,0 +1,140 @@
+"""Compact rolling bar state for many live symbols"""
+
+import numpy as np
+import pandas as pd
+
+from .aggregator import BAR_FIELDS
+from .core import PATTERN_LOOKAHEAD, pattern_codes, decode
+
+
+class SymbolStateStore:
+    """
+    Rolling window of bars for every symbol in one preallocated array
+
+    State lives in a single (symbols x window x fields) ring buffer with one
+    write position per symbol, so a cross-section of new bars is stored with
+    one fancy-indexed assignment instead of one DataFrame append per symbol.
+    Slots that were never written hold NaN, which the pattern masks treat
+    exactly like the warm-up rows of a rolling window.
+
+    Args:
+        symbols: Sequence of symbol names
+        window: Number of bars kept per symbol
+        fields: Names of the per-bar fields, in column order
+        dtype: Storage dtype; float32 halves memory for large universes
+    """
+
+    def __init__(self, symbols, window=256, fields=BAR_FIELDS, dtype=np.float64):
+        self.symbols = list(symbols)
+        self.fields = tuple(fields)
+        self.window = window
+        self._index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        if len(self._index) != len(self.symbols):
+            raise ValueError("symbols must be unique")
+        self._data = np.full((len(self.symbols), window, len(self.fields)), np.nan, dtype=dtype)
+        self._head = np.zeros(len(self.symbols), dtype=np.int64)
+        self._count = np.zeros(len(self.symbols), dtype=np.int64)
+
+    @property
+    def nbytes(self):
+        """Memory held by the bar buffer"""
+        return self._data.nbytes
+
+    def rows(self, symbols):
+        """Row numbers of the given symbols"""
+        return np.fromiter((self._index[s] for s in symbols), dtype=np.int64, count=len(symbols))
+
+    def update(self, bars, symbols=None, rows=None):
+        """
+        Append one bar to each of the given symbols
+
+        Args:
+            bars: Array of shape (n_symbols, n_fields)
+            symbols: Symbol names matching bars (integer names are names too)
+            rows: Row numbers matching bars, instead of symbols; with neither,
+                bars holds a full cross-section in store order
+
+        Returns:
+            self
+        """
+        bars = np.asarray(bars)
+        if symbols is not None and rows is not None:
+            raise ValueError("pass either symbols or rows, not both")
+        if symbols is not None:
+            rows = self.rows(symbols)
+        elif rows is None:
+            rows = np.arange(len(self.symbols))
+        else:
+            rows = np.asarray(rows, dtype=np.int64)
+        if bars.shape != (len(rows), len(self.fields)):
+            raise ValueError(f"bars must have shape {(len(rows), len(self.fields))}, got {bars.shape}")
+
+        self._data[rows, self._head[rows]] = bars
+        self._head[rows] = (self._head[rows] + 1) % self.window
+        self._count[rows] = np.minimum(self._count[rows] + 1, self.window)
+        return self
+
+    def values(self, last=None, rows=None):
+        """
+        Time-ordered view of the buffer
+
+        Args:
+            last: Only return the most recent `last` bars (default: whole window)
+            rows: Restrict to these row numbers (default: all symbols)
+
+        Returns:
+            Array of shape (n_symbols, last, n_fields), oldest bar first
+        """
+        last = self.window if last is None else min(last, self.window)
+        head = self._head if rows is None else self._head[rows]
+        data = self._data if rows is None else self._data[rows]
+        order = (head[:, None] + np.arange(self.window - last, self.window)) % self.window
+        return np.take_along_axis(data, order[:, :, None], axis=1)
+
+    def field(self, name, last=None, rows=None):
+        """Time-ordered (n_symbols, last) matrix of a single field"""
+        return self.values(last, rows)[:, :, self.fields.index(name)]
+
+    def evaluate(self, pattern, window=3, threshold=0.05, last=None):
+        """
+        Evaluate a pattern for all symbols at once
+
+        Args:
+            pattern: Key of core.PATTERN_LABELS
+            window: Rolling window of the detector
+            threshold: Range threshold for the 'double' pattern
+            last: Number of trailing bars to evaluate (default: whole window)
+
+        Returns:
+            int8 array (n_symbols, last) of label codes
+        """
+        values = self.values(last)
+        high = values[:, :, self.fields.index('High')]
+        low = values[:, :, self.fields.index('Low')]
+        close = values[:, :, self.fields.index('Close')]
+        return pattern_codes(pattern, high, low, close, window, threshold)
+
+    def latest(self, pattern, window=3, threshold=0.05):
+        """
+        Label of the most recent confirmed bar for every symbol
+
+        Head and shoulder and double top/bottom look one bar ahead, so their
+        newest bar is not final yet and the label of the bar before it is
+        returned; the other patterns only use past bars and return the newest
+        bar's label. Only the few trailing bars the label depends on are
+        evaluated.
+
+        Returns:
+            Series of labels indexed by symbol
+        """
+        column = -1 - PATTERN_LOOKAHEAD[pattern]
+        codes = self.evaluate(pattern, window, threshold, last=max(window, 2) + 1)[:, column]
+        return pd.Series(decode(pattern, codes), index=self.symbols, name=pattern)
+
+    def frame(self, symbol):
+        """Bars of one symbol as a DataFrame with the DataFrame API's columns"""
+        row = self._index[symbol]
+        count = self._count[row]
+        values = self.values(count, rows=np.array([row]))[0]
+        return pd.DataFrame(values, columns=list(self.fields))
+
@@ -1,6 +1,24 @@
-import pandas as pd
 import numpy as np
 
+from .core import (
+    head_shoulder_masks,
+    multiple_top_bottom_masks,
+    triangle_masks,
+    wedge_masks,
+    channel_masks,
+    double_masks
+)
+from .expr import col, evaluate_codes
+
+
+def _inputs(df, *columns):
+    # Column arrays fed to the blocked mask evaluation
+    return {c: df[c].to_numpy(dtype=np.float64) for c in columns}
+
+def _rolling_trend(series, window):
+    # 1 if the window ends higher than it starts, -1 if lower, 0 if flat; NaN until the window is full
+    trend = np.sign(series - series.shift(window - 1))
+    return trend.where(series.rolling(window=window).count() == window)
 
 def detect_head_shoulder(df, window=3):
 # Define the rolling window
@@ -8,14 +26,13 @@ def detect_head_shoulder(df, window=3):
     # Create a rolling window for High and Low
     df['high_roll_max'] = df['High'].rolling(window=roll_window).max()
     df['low_roll_min'] = df['Low'].rolling(window=roll_window).min()
-    # Create a boolean mask for Head and Shoulder pattern
-    mask_head_shoulder = ((df['high_roll_max'] > df['High'].shift(1)) & (df['high_roll_max'] > df['High'].shift(-1)) & (df['High'] < df['High'].shift(1)) & (df['High'] < df['High'].shift(-1)))
-    # Create a boolean mask for Inverse Head and Shoulder pattern
-    mask_inv_head_shoulder = ((df['low_roll_min'] < df['Low'].shift(1)) & (df['low_roll_min'] < df['Low'].shift(-1)) & (df['Low'] > df['Low'].shift(1)) & (df['Low'] > df['Low'].shift(-1)))
-    # Create a new column for Head and Shoulder and its inverse pattern and populate it using the boolean masks
+    # Evaluate the Head and Shoulder (1) and Inverse Head and Shoulder (2) masks block by block
+    masks = head_shoulder_masks(col('High'), col('Low'), col('high_roll_max'), col('low_roll_min'))
+    codes = evaluate_codes(*masks, _inputs(df, 'High', 'Low', 'high_roll_max', 'low_roll_min'))
+    # Create a new column for Head and Shoulder and its inverse pattern and populate it using the masks
     df['head_shoulder_pattern'] = ''
-    df.loc[mask_head_shoulder, 'head_shoulder_pattern'] = 'Head and Shoulder'
-    df.loc[mask_inv_head_shoulder, 'head_shoulder_pattern'] = 'Inverse Head and Shoulder'
+    df.loc[codes == 1, 'head_shoulder_pattern'] = 'Head and Shoulder'
+    df.loc[codes == 2, 'head_shoulder_pattern'] = 'Inverse Head and Shoulder'
     return df 
     # return not df['head_shoulder_pattern'].isna().any().item()
 
@@ -27,14 +44,13 @@ def detect_multiple_tops_bottoms(df, window=3):
     df['low_roll_min'] = df['Low'].rolling(window=roll_window).min()
     df['close_roll_max'] = df['Close'].rolling(window=roll_window).max()
     df['close_roll_min'] = df['Close'].rolling(window=roll_window).min()
-    # Create a boolean mask for multiple top pattern
-    mask_top = (df['high_roll_max'] >= df['High'].shift(1)) & (df['close_roll_max'] < df['Close'].shift(1))
-    # Create a boolean mask for multiple bottom pattern
-    mask_bottom = (df['low_roll_min'] <= df['Low'].shift(1)) & (df['close_roll_min'] > df['Close'].shift(1))
-    # Create a new column for multiple top bottom pattern and populate it using the boolean masks
+    # Evaluate the multiple top (1) and multiple bottom (2) masks block by block
+    masks = multiple_top_bottom_masks(col('High'), col('Low'), col('Close'), col('high_roll_max'), col('low_roll_min'), col('close_roll_max'), col('close_roll_min'))
+    codes = evaluate_codes(*masks, _inputs(df, 'High', 'Low', 'Close', 'high_roll_max', 'low_roll_min', 'close_roll_max', 'close_roll_min'))
+    # Create a new column for multiple top bottom pattern and populate it using the masks
     df['multiple_top_bottom_pattern'] = ''
-    df.loc[mask_top, 'multiple_top_bottom_pattern'] = 'Multiple Top'
-    df.loc[mask_bottom, 'multiple_top_bottom_pattern'] = 'Multiple Bottom'
+    df.loc[codes == 1, 'multiple_top_bottom_pattern'] = 'Multiple Top'
+    df.loc[codes == 2, 'multiple_top_bottom_pattern'] = 'Multiple Bottom'
     return df
 
 def calculate_support_resistance(df, window=3):
@@ -61,14 +77,13 @@ def detect_triangle_pattern(df, window=3):
     # Create a rolling window for High and Low
     df['high_roll_max'] = df['High'].rolling(window=roll_window).max()
     df['low_roll_min'] = df['Low'].rolling(window=roll_window).min()
-    # Create a boolean mask for ascending triangle pattern
-    mask_asc = (df['high_roll_max'] >= df['High'].shift(1)) & (df['low_roll_min'] <= df['Low'].shift(1)) & (df['Close'] > df['Close'].shift(1))
-    # Create a boolean mask for descending triangle pattern
-    mask_desc = (df['high_roll_max'] <= df['High'].shift(1)) & (df['low_roll_min'] >= df['Low'].shift(1)) & (df['Close'] < df['Close'].shift(1))
-    # Create a new column for triangle pattern and populate it using the boolean masks
+    # Evaluate the ascending (1) and descending (2) triangle masks block by block
+    masks = triangle_masks(col('High'), col('Low'), col('Close'), col('high_roll_max'), col('low_roll_min'))
+    codes = evaluate_codes(*masks, _inputs(df, 'High', 'Low', 'Close', 'high_roll_max', 'low_roll_min'))
+    # Create a new column for triangle pattern and populate it using the masks
     df['triangle_pattern'] = ''
-    df.loc[mask_asc, 'triangle_pattern'] = 'Ascending Triangle'
-    df.loc[mask_desc, 'triangle_pattern'] = 'Descending Triangle'
+    df.loc[codes == 1, 'triangle_pattern'] = 'Ascending Triangle'
+    df.loc[codes == 2, 'triangle_pattern'] = 'Descending Triangle'
     return df
 
 def detect_wedge(df, window=3):
@@ -77,16 +92,15 @@ def detect_wedge(df, window=3):
     # Create a rolling window for High and Low
     df['high_roll_max'] = df['High'].rolling(window=roll_window).max()
     df['low_roll_min'] = df['Low'].rolling(window=roll_window).min()
-    df['trend_high'] = df['High'].rolling(window=roll_window).apply(lambda x: 1 if (x.iloc[-1]-x.iloc[0])>0 else -1 if (x.iloc[-1]-x.iloc[0])<0 else 0, raw=False)
-    df['trend_low'] = df['Low'].rolling(window=roll_window).apply(lambda x: 1 if (x.iloc[-1]-x.iloc[0])>0 else -1 if (x.iloc[-1]-x.iloc[0])<0 else 0, raw=False)
-    # Create a boolean mask for Wedge Up pattern
-    mask_wedge_up = (df['high_roll_max'] >= df['High'].shift(1)) & (df['low_roll_min'] <= df['Low'].shift(1)) & (df['trend_high'] == 1) & (df['trend_low'] == 1)
-    # Create a boolean mask for Wedge Down pattern
-    mask_wedge_down = (df['high_roll_max'] <= df['High'].shift(1)) & (df['low_roll_min'] >= df['Low'].shift(1)) & (df['trend_high'] == -1) & (df['trend_low'] == -1)
-    # Create a new column for Wedge Up and Wedge Down pattern and populate it using the boolean masks
+    df['trend_high'] = _rolling_trend(df['High'], roll_window)
+    df['trend_low'] = _rolling_trend(df['Low'], roll_window)
+    # Evaluate the Wedge Up (1) and Wedge Down (2) masks block by block
+    masks = wedge_masks(col('High'), col('Low'), col('high_roll_max'), col('low_roll_min'), col('trend_high'), col('trend_low'))
+    codes = evaluate_codes(*masks, _inputs(df, 'High', 'Low', 'high_roll_max', 'low_roll_min', 'trend_high', 'trend_low'))
+    # Create a new column for Wedge Up and Wedge Down pattern and populate it using the masks
     df['wedge_pattern'] = ''
-    df.loc[mask_wedge_up, 'wedge_pattern'] = 'Wedge Up'
-    df.loc[mask_wedge_down, 'wedge_pattern'] = 'Wedge Down'
+    df.loc[codes == 1, 'wedge_pattern'] = 'Wedge Up'
+    df.loc[codes == 2, 'wedge_pattern'] = 'Wedge Down'
     return df
 
 def detect_channel(df, window=3):
@@ -97,16 +111,15 @@ def detect_channel(df, window=3):
     # Create a rolling window for High and Low
     df['high_roll_max'] = df['High'].rolling(window=roll_window).max()
     df['low_roll_min'] = df['Low'].rolling(window=roll_window).min()
-    df['trend_high'] = df['High'].rolling(window=roll_window).apply(lambda x: 1 if (x.iloc[-1]-x.iloc[0])>0 else -1 if (x.iloc[-1]-x.iloc[0])<0 else 0, raw=False)
-    df['trend_low'] = df['Low'].rolling(window=roll_window).apply(lambda x: 1 if (x.iloc[-1]-x.iloc[0])>0 else -1 if (x.iloc[-1]-x.iloc[0])<0 else 0, raw=False)
-    # Create a boolean mask for Channel Up pattern
-    mask_channel_up = (df['high_roll_max'] >= df['High'].shift(1)) & (df['low_roll_min'] <= df['Low'].shift(1)) & (df['high_roll_max'] - df['low_roll_min'] <= channel_range * (df['high_roll_max'] + df['low_roll_min'])/2) & (df['trend_high'] == 1) & (df['trend_low'] == 1)
-    # Create a boolean mask for Channel Down pattern
-    mask_channel_down = (df['high_roll_max'] <= df['High'].shift(1)) & (df['low_roll_min'] >= df['Low'].shift(1)) & (df['high_roll_max'] - df['low_roll_min'] <= channel_range * (df['high_roll_max'] + df['low_roll_min'])/2) & (df['trend_high'] == -1) & (df['trend_low'] == -1)
-    # Create a new column for Channel Up and Channel Down pattern and populate it using the boolean masks
+    df['trend_high'] = _rolling_trend(df['High'], roll_window)
+    df['trend_low'] = _rolling_trend(df['Low'], roll_window)
+    # Evaluate the Channel Up (1) and Channel Down (2) masks block by block
+    masks = channel_masks(col('High'), col('Low'), col('high_roll_max'), col('low_roll_min'), col('trend_high'), col('trend_low'), channel_range)
+    codes = evaluate_codes(*masks, _inputs(df, 'High', 'Low', 'high_roll_max', 'low_roll_min', 'trend_high', 'trend_low'))
+    # Create a new column for Channel Up and Channel Down pattern and populate it using the masks
     df['channel_pattern'] = ''
-    df.loc[mask_channel_up, 'channel_pattern'] = 'Channel Up'
-    df.loc[mask_channel_down, 'channel_pattern'] = 'Channel Down'
+    df.loc[codes == 1, 'channel_pattern'] = 'Channel Up'
+    df.loc[codes == 2, 'channel_pattern'] = 'Channel Down'
     return df
 
 def detect_double_top_bottom(df, window=3, threshold=0.05):
@@ -119,15 +132,14 @@ def detect_double_top_bottom(df, window=3, threshold=0.05):
     df['high_roll_max'] = df['High'].rolling(window=roll_window).max()
     df['low_roll_min'] = df['Low'].rolling(window=roll_window).min()
 
-    # Create a boolean mask for Double Top pattern
-    mask_double_top = (df['high_roll_max'] >= df['High'].shift(1)) & (df['high_roll_max'] >= df['High'].shift(-1)) & (df['High'] < df['High'].shift(1)) & (df['High'] < df['High'].shift(-1)) & ((df['High'].shift(1) - df['Low'].shift(1)) <= range_threshold * (df['High'].shift(1) + df['Low'].shift(1))/2) & ((df['High'].shift(-1) - df['Low'].shift(-1)) <= range_threshold * (df['High'].shift(-1) + df['Low'].shift(-1))/2)
-    # Create a boolean mask for Double Bottom pattern
-    mask_double_bottom = (df['low_roll_min'] <= df['Low'].shift(1)) & (df['low_roll_min'] <= df['Low'].shift(-1)) & (df['Low'] > df['Low'].shift(1)) & (df['Low'] > df['Low'].shift(-1)) & ((df['High'].shift(1) - df['Low'].shift(1)) <= range_threshold * (df['High'].shift(1) + df['Low'].shift(1))/2) & ((df['High'].shift(-1) - df['Low'].shift(-1)) <= range_threshold * (df['High'].shift(-1) + df['Low'].shift(-1))/2)
+    # Evaluate the Double Top (1) and Double Bottom (2) masks block by block
+    masks = double_masks(col('High'), col('Low'), col('high_roll_max'), col('low_roll_min'), range_threshold)
+    codes = evaluate_codes(*masks, _inputs(df, 'High', 'Low', 'high_roll_max', 'low_roll_min'))
 
-    # Create a new column for Double Top and Double Bottom pattern and populate it using the boolean masks
+    # Create a new column for Double Top and Double Bottom pattern and populate it using the masks
     df['double_pattern'] = ''
-    df.loc[mask_double_top, 'double_pattern'] = 'Double Top'
-    df.loc[mask_double_bottom, 'double_pattern'] = 'Double Bottom'
+    df.loc[codes == 1, 'double_pattern'] = 'Double Top'
+    df.loc[codes == 2, 'double_pattern'] = 'Double Bottom'
     return df
 
 def detect_trendline(df, window=2):
@@ -1,7 +1,6 @@
 """Utility functions for pattern filtering and analysis"""
 
 import numpy as np
-import pandas as pd
 
 
 def filter_patterns_by_distance(positions, min_distance=15):
@@ -52,15 +51,46 @@ def cluster_and_select_best(positions, ohlc, cluster_distance=10):
     clusters.append(current_cluster)
     
     # Select best from each cluster (highest range)
+    high = ohlc['High'].to_numpy()
+    low = ohlc['Low'].to_numpy()
     best_positions = []
     for cluster in clusters:
-        ranges = [ohlc['High'].iloc[p] - ohlc['Low'].iloc[p] for p in cluster]
+        ranges = high[cluster] - low[cluster]
         best_idx = np.argmax(ranges)
         best_positions.append(cluster[best_idx])
     
     return np.array(best_positions)
 
 
+def top_k_indices(values, k):
+    """
+    Indices of the k largest values, largest first
+    
+    Uses a partial partition, O(n + k log k), instead of a full sort. Ties are
+    broken by position, earlier first, exactly like a stable descending sort;
+    NaN ranks below every number.
+    
+    Args:
+        values: 1-D array of scores
+        k: Number of indices to return
+        
+    Returns:
+        Array of at most k indices into values
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = np.where(np.isnan(values), -np.inf, values)
+    n = len(values)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k >= n:
+        return np.argsort(-values, kind='stable')
+    kth = np.partition(values, n - k)[n - k]
+    above = np.flatnonzero(values > kth)
+    ties = np.flatnonzero(values == kth)[:k - len(above)]
+    selected = np.concatenate((above, ties))
+    return selected[np.argsort(-values[selected], kind='stable')]
+
+
 def filter_by_strength(positions, ohlc, top_n=10):
     """
     Select top_n strongest patterns by price range
@@ -76,14 +106,11 @@ def filter_by_strength(positions, ohlc, top_n=10):
     if len(positions) == 0 or len(positions) <= top_n:
         return positions
     
-    strengths = []
-    for pos in positions:
-        strength = ohlc['High'].iloc[pos] - ohlc['Low'].iloc[pos]
-        strengths.append((pos, strength))
+    positions = np.asarray(positions)
+    ranges = ohlc['High'].to_numpy()[positions] - ohlc['Low'].to_numpy()[positions]
     
-    # Sort by strength and take top_n
-    strengths.sort(key=lambda x: x[1], reverse=True)
-    filtered = np.array([s[0] for s in strengths[:top_n]])
+    # Select the top_n by strength without sorting every candidate
+    filtered = positions[top_k_indices(ranges, top_n)]
     return np.sort(filtered)  # Re-sort by time
 
 